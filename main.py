@@ -11,34 +11,66 @@ Usage:
     python3 main.py --status            # Check system status
     python3 main.py --refresh-policies  # Refresh policy index
     python3 main.py --test              # Test all components
+    python3 main.py --fast-config       # Reuse cached configuration
 """
 
+import atexit
 import logging
+import os
+import queue
 import time
 import argparse
 import signal
 import sys
+import threading
 from datetime import datetime
-from typing import Dict, Any
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Callable, Dict, Tuple
+
+# --fast-config has to be applied before the config module is first imported
+if "--fast-config" in sys.argv:
+    os.environ["FAST_CONFIG"] = "true"
 
 from src.email_responder.config import config
-from src.email_responder.workflow import email_workflow
-from src.email_responder.gmail_fetcher import gmail_fetcher
-from src.email_responder.retriever_chain import policy_retriever
-from src.email_responder.llm_response_chain import llm_response_chain
-from src.email_responder.email_sender import email_sender
-from src.email_responder.cache_manager import cache_manager
 
-# Setup logging
-logging.basicConfig(
-    level=getattr(logging, config.log_level.upper()),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/email_responder.log'),
-        logging.StreamHandler()
-    ]
-)
+# Pipeline components pull in LangChain, sentence-transformers, Chroma and the
+# Google API clients, so they are imported inside the commands that need them.
+
+# Component checks still running after this long are reported as failed
+COMPONENT_CHECK_TIMEOUT_SECONDS = 30
+
+
+def setup_logging() -> QueueListener:
+    """Setup logging with file and console output handled off the calling thread.
+    
+    Records are put on a queue and written by a background QueueListener, so
+    logging in the processing loop never blocks on file or console I/O.
+    """
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    file_handler = RotatingFileHandler(
+        'logs/email_responder.log',
+        maxBytes=10 * 1024 * 1024,
+        backupCount=5,
+        delay=True
+    )
+    stream_handler = logging.StreamHandler()
+    file_handler.setFormatter(formatter)
+    stream_handler.setFormatter(formatter)
+    
+    log_queue: queue.Queue = queue.Queue(-1)
+    root_logger = logging.getLogger()
+    root_logger.setLevel(getattr(logging, config.log_level.upper()))
+    root_logger.addHandler(QueueHandler(log_queue))
+    
+    listener = QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+    listener.start()
+    # Flush queued records on every exit path, including sys.exit and signals
+    atexit.register(listener.stop)
+    return listener
+
 
+# Setup logging
+log_listener = setup_logging()
 logger = logging.getLogger(__name__)
 
 
@@ -47,6 +79,7 @@ class EmailResponderApp:
     
     def __init__(self):
         self.running = False
+        self._stop_event = threading.Event()
         self.setup_signal_handlers()
     
     def setup_signal_handlers(self):
@@ -58,9 +91,12 @@ class EmailResponderApp:
         """Handle shutdown signals."""
         logger.info(f"Received signal {signum}, shutting down gracefully...")
         self.running = False
+        self._stop_event.set()
     
     def run_once(self) -> Dict[str, Any]:
         """Process emails once and return results."""
+        from src.email_responder.workflow import email_workflow
+        
         logger.info("Starting single email processing run")
         
         try:
@@ -79,45 +115,51 @@ class EmailResponderApp:
     
     def run_daemon(self):
         """Run continuously as a daemon process."""
+        from src.email_responder.workflow import email_workflow
+        
         logger.info(f"Starting email responder daemon (interval: {config.processing_interval_minutes} minutes)")
         
         self.running = True
+        self._stop_event.clear()
+        interval_seconds = config.processing_interval_minutes * 60
         last_processing_time = 0
         
         while self.running:
             try:
+                # Sleep until the next run is due; a shutdown signal wakes us early
+                sleep_for = max(0, interval_seconds - (time.time() - last_processing_time))
+                if self._stop_event.wait(sleep_for):
+                    break
+                
                 current_time = time.time()
-                interval_seconds = config.processing_interval_minutes * 60
+                logger.info("Starting scheduled email processing")
                 
-                # Check if it's time to process emails
-                if current_time - last_processing_time >= interval_seconds:
-                    logger.info("Starting scheduled email processing")
-                    
-                    result = email_workflow.process_emails(
-                        thread_id=f"daemon_{int(current_time)}"
-                    )
-                    
-                    if result.get("success"):
-                        logger.info(f"Daemon processing successful: {result.get('successful_responses', 0)} responses sent")
-                    else:
-                        logger.error(f"Daemon processing failed: {result.get('error', 'Unknown error')}")
-                    
-                    last_processing_time = current_time
+                result = email_workflow.process_emails(
+                    thread_id=f"daemon_{int(current_time)}"
+                )
+                
+                if result.get("success"):
+                    logger.info(f"Daemon processing successful: {result.get('successful_responses', 0)} responses sent")
                 else:
-                    # Sleep for a short time before checking again
-                    time.sleep(30)
+                    logger.error(f"Daemon processing failed: {result.get('error', 'Unknown error')}")
+                
+                last_processing_time = current_time
                     
             except KeyboardInterrupt:
                 logger.info("Daemon interrupted by user")
                 break
             except Exception as e:
                 logger.error(f"Daemon error: {e}")
-                time.sleep(60)  # Wait before retrying
+                self._stop_event.wait(60)  # Wait before retrying
         
         logger.info("Email responder daemon stopped")
     
     def check_status(self) -> Dict[str, Any]:
         """Check the status of all system components."""
+        from src.email_responder.workflow import email_workflow
+        from src.email_responder.retriever_chain import policy_retriever
+        from src.email_responder.cache_manager import cache_manager
+        
         logger.info("Checking system status")
         
         status = {
@@ -138,6 +180,8 @@ class EmailResponderApp:
     
     def refresh_policies(self) -> bool:
         """Refresh the policy knowledge base index."""
+        from src.email_responder.retriever_chain import policy_retriever
+        
         logger.info("Refreshing policy knowledge base")
         
         try:
@@ -151,40 +195,77 @@ class EmailResponderApp:
             logger.error(f"Error refreshing policies: {e}")
             return False
     
+    @staticmethod
+    def _run_checks(checks: Dict[str, Tuple[str, Callable[[], Any]]]) -> Dict[str, bool]:
+        """Run component checks concurrently, failing any still running after the timeout.
+        
+        Checks run on daemon threads: executor workers are joined at
+        interpreter exit, so a hung probe would keep the command alive.
+        """
+        results: queue.Queue = queue.Queue()
+        
+        def run(name: str, check: Callable[[], Any]) -> None:
+            try:
+                results.put((name, bool(check()), None))
+            except Exception as e:
+                results.put((name, False, e))
+        
+        for name, (_, check) in checks.items():
+            threading.Thread(target=run, args=(name, check), name=f"check-{name}", daemon=True).start()
+        
+        outcomes: Dict[str, bool] = {}
+        deadline = time.monotonic() + COMPONENT_CHECK_TIMEOUT_SECONDS
+        while len(outcomes) < len(checks):
+            try:
+                name, passed, error = results.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if error is not None:
+                logger.error(f"{checks[name][0]} test raised an error: {error!r}")
+            outcomes[name] = passed
+            logger.info(f"{checks[name][0]} test: {'PASS' if passed else 'FAIL'}")
+        
+        for name in checks.keys() - outcomes.keys():
+            logger.error(f"{checks[name][0]} test timed out after {COMPONENT_CHECK_TIMEOUT_SECONDS}s")
+            outcomes[name] = False
+            logger.info(f"{checks[name][0]} test: FAIL")
+        
+        return outcomes
+    
     def test_components(self, ai_only: bool = False) -> Dict[str, bool]:
         """Test all system components.
         
         Args:
             ai_only: If True, only test AI components (skip Gmail)
         """
+        from src.email_responder.retriever_chain import policy_retriever
+        from src.email_responder.llm_response_chain import llm_response_chain
+        from src.email_responder.cache_manager import cache_manager
+        
         logger.info(f"Testing {'AI-only' if ai_only else 'all'} system components")
         
         test_results = {}
         
         try:
+            # Component probes are independent network round trips, so run them concurrently
+            checks = {}
             if not ai_only:
-                # Test Gmail fetcher
-                test_results["gmail_fetcher"] = gmail_fetcher.test_connection()
-                logger.info(f"Gmail fetcher test: {'PASS' if test_results['gmail_fetcher'] else 'FAIL'}")
+                from src.email_responder.gmail_fetcher import gmail_fetcher
+                from src.email_responder.email_sender import email_sender
                 
-                # Test email sender
-                test_results["email_sender"] = email_sender.test_connection()
-                logger.info(f"Email sender test: {'PASS' if test_results['email_sender'] else 'FAIL'}")
+                checks["gmail_fetcher"] = ("Gmail fetcher", gmail_fetcher.test_connection)
+                checks["email_sender"] = ("Email sender", email_sender.test_connection)
             else:
                 logger.info("Skipping Gmail tests (AI-only mode)")
             
-            # Test LLM response chain
-            test_results["llm_response"] = llm_response_chain.test_connection()
-            logger.info(f"LLM response test: {'PASS' if test_results['llm_response'] else 'FAIL'}")
-            
-            # Test cache manager
-            test_results["cache_manager"] = cache_manager.test_connection()
-            logger.info(f"Cache manager test: {'PASS' if test_results['cache_manager'] else 'FAIL'}")
+            checks["llm_response"] = ("LLM response", llm_response_chain.test_connection)
+            checks["cache_manager"] = ("Cache manager", cache_manager.test_connection)
+            checks["policy_retriever"] = (
+                "Policy retriever",
+                lambda: policy_retriever.get_index_stats().get("vectorstore_exists", False)
+            )
             
-            # Test policy retriever
-            policy_stats = policy_retriever.get_index_stats()
-            test_results["policy_retriever"] = policy_stats.get("vectorstore_exists", False)
-            logger.info(f"Policy retriever test: {'PASS' if test_results['policy_retriever'] else 'FAIL'}")
+            test_results.update(self._run_checks(checks))
             
             # Test AI pipeline with sample data
             if ai_only or all([test_results.get("llm_response"), test_results.get("policy_retriever")]):
@@ -205,6 +286,9 @@ class EmailResponderApp:
 
     def _test_ai_pipeline(self) -> bool:
         """Test the AI pipeline with sample email data."""
+        from src.email_responder.retriever_chain import policy_retriever
+        from src.email_responder.llm_response_chain import llm_response_chain
+        
         try:
             # Sample email for testing
             sample_subject = "Billing Question - Refund Request"
@@ -278,6 +362,11 @@ def main():
         action="store_true", 
         help="Test only AI components (Gemini, policy retrieval, cache) - no Gmail setup required"
     )
+    parser.add_argument(
+        "--fast-config",
+        action="store_true",
+        help="Reuse cached configuration while .env is unchanged (skips settings validation)"
+    )
     parser.add_argument(
         "--verbose", "-v", 
         action="store_true", 
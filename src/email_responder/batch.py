@@ -0,0 +1,166 @@
+"""Gemini Batch API client for bulk, non-latency-critical response generation.
+
+Submissions go through the shared Gemini circuit breaker and rate limiter.
+Status polls do not: they are cheap metadata reads that generate nothing,
+and throttling them would only delay noticing a finished job.
+"""
+
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from .concurrency import CircuitOpenError, llm_guard
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+# Gemini REST endpoint for batch jobs
+BATCH_API_URL = "https://generativelanguage.googleapis.com/v1beta"
+
+# Terminal batch job states
+BATCH_SUCCEEDED = "BATCH_STATE_SUCCEEDED"
+BATCH_FAILED_STATES = frozenset({"BATCH_STATE_FAILED", "BATCH_STATE_CANCELLED", "BATCH_STATE_EXPIRED"})
+
+
+def build_request(
+    key: str,
+    system_prompt: str,
+    user_prompt: str,
+    generation_config: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Build one inline batch request; ``key`` identifies its result."""
+    request: Dict[str, Any] = {
+        "systemInstruction": {"parts": [{"text": system_prompt}]},
+        "contents": [{"role": "user", "parts": [{"text": user_prompt}]}],
+    }
+    if generation_config:
+        request["generationConfig"] = generation_config
+    return {"request": request, "metadata": {"key": key}}
+
+
+def _client() -> httpx.Client:
+    """Create a client authorized for the Gemini API."""
+    return httpx.Client(
+        base_url=BATCH_API_URL,
+        headers={"x-goog-api-key": config.google_api_key},
+        timeout=60.0
+    )
+
+
+def submit_batch(requests: List[Dict[str, Any]], display_name: str = "email-responses") -> Optional[str]:
+    """Submit inline requests as a batch job.
+
+    Returns:
+        The batch job name (e.g. ``batches/123``), or None on failure
+    """
+    try:
+        llm_guard.breaker.before_call()
+    except CircuitOpenError as e:
+        logger.warning("Not submitting batch: %s", e)
+        return None
+    llm_guard.limiter.acquire()
+    
+    body = {
+        "batch": {
+            "display_name": display_name,
+            "input_config": {"requests": {"requests": requests}}
+        }
+    }
+
+    try:
+        with _client() as client:
+            response = client.post(f"/models/{config.gemini_model}:batchGenerateContent", json=body)
+            response.raise_for_status()
+            batch_id = response.json()["name"]
+        llm_guard.breaker.record_success()
+        logger.info("Submitted batch %s with %s requests", batch_id, len(requests))
+        return batch_id
+    except (httpx.HTTPError, KeyError) as e:
+        llm_guard.breaker.record_failure()
+        logger.error("Failed to submit batch: %s", e)
+        return None
+
+
+def poll_batch(batch_id: str) -> Optional[Dict[str, Any]]:
+    """Get the current state of a batch job."""
+    try:
+        with _client() as client:
+            response = client.get(f"/{batch_id}")
+            response.raise_for_status()
+            return response.json()
+    except httpx.HTTPError as e:
+        logger.error("Failed to poll batch %s: %s", batch_id, e)
+        return None
+
+
+def cancel_batch(batch_id: str) -> bool:
+    """Cancel a batch job so it stops running (and billing)."""
+    try:
+        with _client() as client:
+            response = client.post(f"/{batch_id}:cancel")
+            response.raise_for_status()
+        logger.info("Cancelled batch %s", batch_id)
+        return True
+    except httpx.HTTPError as e:
+        logger.error("Failed to cancel batch %s: %s", batch_id, e)
+        return False
+
+
+def _batch_state(job: Dict[str, Any]) -> str:
+    """Extract the job state from a batch operation."""
+    return job.get("metadata", {}).get("state") or job.get("state", "")
+
+
+def wait_for_batch(batch_id: str) -> Optional[Dict[str, Any]]:
+    """Poll a batch job until it finishes or ``config.batch_timeout_minutes`` passes.
+
+    A job still running at the deadline is cancelled; its emails are
+    released and regenerated by the next run anyway.
+
+    Returns:
+        The finished job, or None if it failed or timed out
+    """
+    deadline = time.monotonic() + config.batch_timeout_minutes * 60
+
+    while time.monotonic() < deadline:
+        job = poll_batch(batch_id)
+        if job:
+            state = _batch_state(job)
+            if state == BATCH_SUCCEEDED:
+                return job
+            if state in BATCH_FAILED_STATES:
+                if state == "BATCH_STATE_FAILED":
+                    llm_guard.breaker.record_failure()
+                logger.error("Batch %s ended in state %s", batch_id, state)
+                return None
+        time.sleep(config.batch_poll_interval_seconds)
+
+    logger.error("Timed out waiting for batch %s", batch_id)
+    cancel_batch(batch_id)
+    return None
+
+
+def fetch_batch_results(job: Dict[str, Any]) -> Dict[str, str]:
+    """Map request keys to generated text for a finished batch job.
+
+    Requests that errored or produced no text are left out.
+    """
+    inlined = job.get("response", {}).get("inlinedResponses", [])
+    if isinstance(inlined, dict):
+        inlined = inlined.get("inlinedResponses", [])
+
+    results = {}
+    for item in inlined:
+        key = item.get("metadata", {}).get("key")
+        if key is None or "error" in item:
+            continue
+
+        candidates = item.get("response", {}).get("candidates", [])
+        if not candidates:
+            continue
+        parts = candidates[0].get("content", {}).get("parts", [])
+        results[key] = "".join(part.get("text", "") for part in parts)
+
+    return results
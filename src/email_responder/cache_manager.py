@@ -1,10 +1,19 @@
 """Cache manager for prompt and embedding reuse."""
 
+import atexit
 import json
-import hashlib
 import logging
-from typing import Any, Optional, Dict, Union
-from datetime import datetime, timedelta
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Optional, Dict, List, Union
+
+import blake3
+import faiss
+import msgpack
+import numpy as np
+from cachetools import TTLCache
 
 try:
     import redis as redis_module
@@ -17,41 +26,84 @@ from .config import config
 
 logger = logging.getLogger(__name__)
 
+# Nearest neighbours checked per semantic lookup; the closest may belong to another scope
+SEMANTIC_SEARCH_K = 8
+
+
+@lru_cache(maxsize=4096)
+def _digest(data: str) -> str:
+    """Return a 128-bit BLAKE3 hex digest of ``data``.
+
+    Prompt, policy and embedding keys repeat heavily, so digests are memoized.
+    """
+    return blake3.blake3(data.encode('utf-8')).hexdigest(length=16)
+
+
+def content_key(*parts: str) -> str:
+    """Return a fixed-size BLAKE3 key for long text such as email bodies.
+    
+    Parts are hashed with a separator, so callers never build (or cache) the
+    full concatenated string.
+    """
+    hasher = blake3.blake3()
+    for i, part in enumerate(parts):
+        if i:
+            hasher.update(b'|')
+        hasher.update(part.encode('utf-8'))
+    return hasher.hexdigest(length=16)
+
 
 class CacheManager:
     """Manages caching for prompts, embeddings, and responses."""
     
     def __init__(self):
-        self.memory_cache: Dict[str, Any] = {}
+        self.memory_cache: TTLCache = TTLCache(
+            maxsize=config.memory_cache_max_entries,
+            ttl=config.cache_ttl_hours * 3600
+        )
+        # TTLCache mutates itself on reads (expiry, LRU order), so every access takes the lock
+        self._memory_lock = threading.Lock()
         self.redis_client: Optional[Any] = None
         
         if config.use_redis_cache and REDIS_AVAILABLE and redis_module:
             try:
-                self.redis_client = redis_module.from_url(config.redis_url)
+                # Pooled connections let concurrent callers (batch lookups, parallel
+                # component probes) use separate sockets. Values are always bytes,
+                # fed straight to msgpack / np.frombuffer.
+                pool = redis_module.ConnectionPool.from_url(
+                    config.redis_url,
+                    max_connections=config.redis_pool_size,
+                    decode_responses=False
+                )
+                self.redis_client = redis_module.Redis(connection_pool=pool)
                 self.redis_client.ping()
                 logger.info("Connected to Redis cache")
             except Exception as e:
-                logger.warning(f"Failed to connect to Redis: {e}. Using memory cache.")
+                logger.warning("Failed to connect to Redis: %s. Using memory cache.", e)
                 self.redis_client = None
         elif config.use_redis_cache and not REDIS_AVAILABLE:
             logger.warning("Redis not available. Using memory cache.")
+        
+        self.semantic_index: Optional[Any] = None
+        # [scope, response, created_at] entries, oldest first, aligned with the rows of semantic_index
+        self.semantic_responses: List[List[Any]] = []
+        self._semantic_lock = threading.Lock()
+        self._semantic_dirty = False
+        if config.semantic_cache_enabled:
+            self._load_semantic_cache()
+            # Additions are persisted in bulk by save_semantic_cache, at the latest on exit
+            atexit.register(self.save_semantic_cache)
     
     def _get_cache_key(self, prefix: str, data: str) -> str:
         """Generate a cache key from data."""
-        hash_obj = hashlib.md5(data.encode('utf-8'))
-        return f"{prefix}:{hash_obj.hexdigest()}"
-    
-    def _is_expired(self, timestamp: str) -> bool:
-        """Check if cache entry is expired."""
-        try:
-            cache_time = datetime.fromisoformat(timestamp)
-            expiry_time = cache_time + timedelta(hours=config.cache_ttl_hours)
-            return datetime.now() > expiry_time
-        except Exception:
-            return True
+        return f"{prefix}:{_digest(data)}"
     
     def get(self, prefix: str, key: str) -> Optional[Any]:
-        """Get value from cache."""
+        """Get value from cache.
+        
+        Expiry is enforced by Redis TTLs and the TTLCache, so hits are
+        returned without any timestamp checks.
+        """
         cache_key = self._get_cache_key(prefix, key)
         
         # Try Redis first
@@ -59,80 +111,304 @@ class CacheManager:
             try:
                 cached_data = self.redis_client.get(cache_key)
                 if cached_data:
-                    # Handle bytes returned by Redis
-                    if isinstance(cached_data, bytes):
-                        cached_data = cached_data.decode('utf-8')
-                    data = json.loads(cached_data)
-                    if not self._is_expired(data['timestamp']):
-                        logger.debug(f"Cache hit (Redis): {cache_key}")
-                        return data['value']
-                    else:
-                        self.redis_client.delete(cache_key)
+                    logger.debug("Cache hit (Redis): %s", cache_key)
+                    return msgpack.unpackb(cached_data, raw=False)
             except Exception as e:
-                logger.warning(f"Redis cache error: {e}")
+                logger.warning("Redis cache error: %s", e)
         
         # Fallback to memory cache
-        if cache_key in self.memory_cache:
-            data = self.memory_cache[cache_key]
-            if not self._is_expired(data['timestamp']):
-                logger.debug(f"Cache hit (memory): {cache_key}")
-                return data['value']
-            else:
-                del self.memory_cache[cache_key]
-        
-        logger.debug(f"Cache miss: {cache_key}")
+        with self._memory_lock:
+            value = self.memory_cache.get(cache_key)
+        if value is not None:
+            logger.debug("Cache hit (memory): %s", cache_key)
+            return value
+        
+        logger.debug("Cache miss: %s", cache_key)
         return None
     
     def set(self, prefix: str, key: str, value: Any) -> None:
         """Set value in cache."""
         cache_key = self._get_cache_key(prefix, key)
-        cache_data = {
-            'value': value,
-            'timestamp': datetime.now().isoformat()
-        }
         
         # Store in Redis if available
         if self.redis_client:
             try:
-                ttl_seconds = int(timedelta(hours=config.cache_ttl_hours).total_seconds())
+                ttl_seconds = config.cache_ttl_hours * 3600
                 self.redis_client.setex(
                     cache_key,
                     ttl_seconds,
-                    json.dumps(cache_data, default=str)
+                    msgpack.packb(value, use_bin_type=True, default=str)
                 )
-                logger.debug(f"Cached in Redis: {cache_key}")
+                logger.debug("Cached in Redis: %s", cache_key)
             except Exception as e:
-                logger.warning(f"Failed to cache in Redis: {e}")
+                logger.warning("Failed to cache in Redis: %s", e)
         
         # Always store in memory as backup
-        self.memory_cache[cache_key] = cache_data
-        logger.debug(f"Cached in memory: {cache_key}")
+        with self._memory_lock:
+            self.memory_cache[cache_key] = value
+        logger.debug("Cached in memory: %s", cache_key)
+    
+    def get_many(self, prefix: str, keys: List[str]) -> Dict[str, Any]:
+        """Get several values from cache in a single Redis round trip.
+        
+        Returns a dict containing only the keys that were found.
+        """
+        cache_keys = {key: self._get_cache_key(prefix, key) for key in keys}
+        results: Dict[str, Any] = {}
+        
+        if self.redis_client and cache_keys:
+            try:
+                values = self.redis_client.mget(list(cache_keys.values()))
+                for key, cached_data in zip(cache_keys, values):
+                    if cached_data:
+                        results[key] = msgpack.unpackb(cached_data, raw=False)
+            except Exception as e:
+                logger.warning("Redis cache error: %s", e)
+        
+        with self._memory_lock:
+            for key, cache_key in cache_keys.items():
+                if key in results:
+                    continue
+                value = self.memory_cache.get(cache_key)
+                if value is not None:
+                    results[key] = value
+        
+        logger.debug("Batch cache lookup: %s/%s hits", len(results), len(cache_keys))
+        return results
+    
+    def set_many(self, prefix: str, items: Dict[str, Any]) -> None:
+        """Set several values in cache using a single Redis pipeline."""
+        entries = {self._get_cache_key(prefix, key): value for key, value in items.items()}
+        
+        if self.redis_client and entries:
+            try:
+                ttl_seconds = config.cache_ttl_hours * 3600
+                pipe = self.redis_client.pipeline(transaction=False)
+                for cache_key, value in entries.items():
+                    pipe.setex(
+                        cache_key,
+                        ttl_seconds,
+                        msgpack.packb(value, use_bin_type=True, default=str)
+                    )
+                pipe.execute()
+                logger.debug("Cached %s entries in Redis", len(entries))
+            except Exception as e:
+                logger.warning("Failed to cache in Redis: %s", e)
+        
+        with self._memory_lock:
+            self.memory_cache.update(entries)
     
     def get_prompt_response(self, prompt: str) -> Optional[str]:
-        """Get cached response for a prompt."""
+        """Get cached response for a prompt (exact key only)."""
         return self.get("prompt", prompt)
     
-    def set_prompt_response(self, prompt: str, response: str) -> None:
-        """Cache a prompt-response pair."""
+    def get_similar_response(self, embedding: List[float], scope: str = "") -> Optional[str]:
+        """Get a semantically similar cached response.
+        
+        Only entries cached under the same ``scope`` are returned.
+        """
+        return self._semantic_lookup(embedding, scope)
+    
+    def set_prompt_response(
+        self,
+        prompt: str,
+        response: str,
+        embedding: Optional[List[float]] = None,
+        scope: str = ""
+    ) -> None:
+        """Cache a prompt-response pair (and its embedding, if supplied)."""
         self.set("prompt", prompt, response)
+        if embedding is not None:
+            self._semantic_add(embedding, response, scope)
     
-    def get_embedding(self, text: str) -> Optional[list]:
-        """Get cached embedding for text."""
-        return self.get("embedding", text)
+    def _semantic_cache_paths(self) -> tuple:
+        """Get the index and response file paths for the semantic cache."""
+        return (
+            os.path.join(config.semantic_cache_path, "prompts.faiss"),
+            os.path.join(config.semantic_cache_path, "responses.json")
+        )
     
-    def set_embedding(self, text: str, embedding: list) -> None:
+    def _load_semantic_cache(self) -> None:
+        """Load the persisted semantic cache, if any."""
+        index_path, responses_path = self._semantic_cache_paths()
+        if not (os.path.exists(index_path) and os.path.exists(responses_path)):
+            return
+        
+        try:
+            with open(responses_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+            # Older entries lack a scope (and could reach the wrong recipient) or a timestamp
+            if not all(isinstance(entry, list) and len(entry) == 3 for entry in entries):
+                logger.warning("Discarding semantic cache in an older format")
+                return
+            index = faiss.read_index(index_path)
+            if index.ntotal != len(entries):
+                logger.warning("Discarding semantic cache with mismatched index and responses")
+                return
+            self.semantic_index = index
+            self.semantic_responses = entries
+            self._evict_semantic_entries()
+            logger.info("Loaded semantic cache with %s entries", len(self.semantic_responses))
+        except Exception as e:
+            logger.warning("Failed to load semantic cache: %s", e)
+            self.semantic_index = None
+            self.semantic_responses = []
+    
+    def save_semantic_cache(self) -> None:
+        """Persist the semantic cache to disk if it changed since the last save.
+        
+        Blocking; async callers should run it in a thread. Each file is
+        written to a temporary path and moved into place, so a crash never
+        leaves a truncated cache behind.
+        """
+        with self._semantic_lock:
+            if not self._semantic_dirty or self.semantic_index is None:
+                return
+            index_bytes = faiss.serialize_index(self.semantic_index).tobytes()
+            responses_bytes = json.dumps(self.semantic_responses).encode('utf-8')
+            self._semantic_dirty = False
+        
+        index_path, responses_path = self._semantic_cache_paths()
+        try:
+            os.makedirs(config.semantic_cache_path, exist_ok=True)
+            self._write_atomic(responses_path, responses_bytes)
+            self._write_atomic(index_path, index_bytes)
+            logger.debug("Persisted semantic cache")
+        except OSError as e:
+            logger.warning("Failed to persist semantic cache: %s", e)
+            with self._semantic_lock:
+                self._semantic_dirty = True
+    
+    @staticmethod
+    def _write_atomic(path: str, data: bytes) -> None:
+        """Replace ``path`` with ``data`` via a temporary file."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    
+    def _evict_semantic_entries(self) -> None:
+        """Drop expired entries and the oldest ones beyond the size cap; call with the lock held."""
+        entries = self.semantic_responses
+        cutoff = time.time() - config.cache_ttl_hours * 3600
+        drop = 0
+        while drop < len(entries) and entries[drop][2] < cutoff:
+            drop += 1
+        drop = max(drop, len(entries) - config.semantic_cache_max_entries)
+        if drop <= 0:
+            return
+        
+        # Entries are oldest first, so eviction removes a prefix of the index
+        self.semantic_index.remove_ids(faiss.IDSelectorRange(0, drop))
+        del entries[:drop]
+        self._semantic_dirty = True
+    
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        """Return the embedding as a unit-length float32 row vector."""
+        vector = np.asarray(embedding, dtype=np.float32).reshape(1, -1)
+        faiss.normalize_L2(vector)
+        return vector
+    
+    def _semantic_lookup(self, embedding: List[float], scope: str) -> Optional[str]:
+        """Find a cached response for a semantically similar prompt in ``scope``."""
+        if not config.semantic_cache_enabled:
+            return None
+        
+        vector = self._normalize(embedding)
+        with self._semantic_lock:
+            if self.semantic_index is None or self.semantic_index.ntotal == 0:
+                return None
+            if vector.shape[1] != self.semantic_index.d:
+                return None
+            scores, ids = self.semantic_index.search(vector, min(SEMANTIC_SEARCH_K, self.semantic_index.ntotal))
+            for score, idx in zip(scores[0].tolist(), ids[0].tolist()):
+                if idx < 0 or score < config.semantic_cache_threshold:
+                    break
+                entry_scope, response, created_at = self.semantic_responses[idx]
+                if entry_scope == scope and created_at >= time.time() - config.cache_ttl_hours * 3600:
+                    logger.debug("Cache hit (semantic): similarity %.3f", score)
+                    return response
+            return None
+    
+    def _semantic_add(self, embedding: List[float], response: str, scope: str) -> None:
+        """Add a prompt embedding and its response to the semantic cache."""
+        if not config.semantic_cache_enabled:
+            return
+        
+        vector = self._normalize(embedding)
+        with self._semantic_lock:
+            if self.semantic_index is None:
+                self.semantic_index = faiss.IndexFlatIP(vector.shape[1])
+            elif vector.shape[1] != self.semantic_index.d:
+                logger.warning("Embedding dimension mismatch, skipping semantic cache")
+                return
+            self.semantic_index.add(vector)
+            self.semantic_responses.append([scope, response, time.time()])
+            self._semantic_dirty = True
+            self._evict_semantic_entries()
+    
+    def get_embedding(self, text: str) -> Optional[np.ndarray]:
+        """Get cached embedding for text as a float32 vector.
+        
+        Embeddings are stored as raw float32 bytes rather than through the
+        msgpack codec, so Redis hits decode without copying.
+        """
+        cache_key = self._get_cache_key("embedding", text)
+        
+        if self.redis_client:
+            try:
+                raw = self.redis_client.get(cache_key)
+                if raw:
+                    logger.debug("Cache hit (Redis): %s", cache_key)
+                    return np.frombuffer(raw, dtype=np.float32)
+            except Exception as e:
+                logger.warning("Redis cache error: %s", e)
+        
+        with self._memory_lock:
+            embedding = self.memory_cache.get(cache_key)
+        if embedding is not None:
+            logger.debug("Cache hit (memory): %s", cache_key)
+        return embedding
+    
+    def set_embedding(self, text: str, embedding: Union[list, np.ndarray]) -> None:
         """Cache text embedding."""
-        self.set("embedding", text, embedding)
+        cache_key = self._get_cache_key("embedding", text)
+        vector = np.asarray(embedding, dtype=np.float32)
+        
+        if self.redis_client:
+            try:
+                ttl_seconds = config.cache_ttl_hours * 3600
+                self.redis_client.setex(cache_key, ttl_seconds, vector.tobytes())
+            except Exception as e:
+                logger.warning("Failed to cache in Redis: %s", e)
+        
+        with self._memory_lock:
+            self.memory_cache[cache_key] = vector
+    
+    def clear_semantic_cache(self) -> None:
+        """Drop the semantic cache in memory and on disk, e.g. after the policies change."""
+        with self._semantic_lock:
+            self.semantic_index = None
+            self.semantic_responses = []
+            self._semantic_dirty = False
+        for path in self._semantic_cache_paths():
+            if os.path.exists(path):
+                os.remove(path)
     
     def clear_cache(self) -> None:
         """Clear all caches."""
-        self.memory_cache.clear()
+        with self._memory_lock:
+            self.memory_cache.clear()
+        self.clear_semantic_cache()
         if self.redis_client:
             try:
                 self.redis_client.flushall()
                 logger.info("Cleared Redis cache")
             except Exception as e:
-                logger.warning(f"Failed to clear Redis cache: {e}")
+                logger.warning("Failed to clear Redis cache: %s", e)
         logger.info("Cleared memory cache")
 
     def test_connection(self) -> bool:
@@ -154,21 +430,24 @@ class CacheManager:
                     self.redis_client.ping()
                     logger.debug("Redis connection test successful")
                 except Exception as e:
-                    logger.warning(f"Redis connection test failed: {e}")
+                    logger.warning("Redis connection test failed: %s", e)
                     # Still return True since memory cache works
             
             logger.debug("Cache connection test successful")
             return True
             
         except Exception as e:
-            logger.error(f"Cache connection test failed: {e}")
+            logger.error("Cache connection test failed: %s", e)
             return False
 
     def get_cache_stats(self) -> Dict[str, Any]:
         """Get cache statistics and status."""
+        with self._memory_lock:
+            memory_entries = len(self.memory_cache)
         stats = {
             "memory_cache_enabled": True,
-            "memory_cache_entries": len(self.memory_cache),
+            "memory_cache_entries": memory_entries,
+            "semantic_cache_entries": len(self.semantic_responses),
             "redis_enabled": config.use_redis_cache,
             "redis_connected": False,
             "redis_available": REDIS_AVAILABLE
@@ -185,7 +464,7 @@ class CacheManager:
                 stats["redis_total_keys"] = info.get("db0", {}).get("keys", 0)
                 
             except Exception as e:
-                logger.debug(f"Could not get Redis stats: {e}")
+                logger.debug("Could not get Redis stats: %s", e)
         
         return stats
 
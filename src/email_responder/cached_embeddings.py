@@ -0,0 +1,69 @@
+"""Memoized query embeddings shared by retrieval and the semantic cache."""
+
+import logging
+import threading
+from typing import List, Optional, Tuple
+
+from cachetools import LRUCache
+from langchain_core.embeddings import Embeddings
+
+from .cache_manager import content_key
+
+logger = logging.getLogger(__name__)
+
+
+class CachedEmbeddings(Embeddings):
+    """Wrap an embedding model with an LRU cache of query vectors.
+    
+    The same email text is embedded for retrieval and again for the semantic
+    response cache, and repeated subqueries recur across similar emails, so
+    query vectors are cached by content hash. Document embedding is passed
+    straight through; it only happens when the index is built.
+    """
+    
+    def __init__(self, embeddings: Embeddings, maxsize: int):
+        self.embeddings = embeddings
+        self._cache: LRUCache = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+    
+    def _get(self, key: str) -> Optional[Tuple[float, ...]]:
+        with self._lock:
+            return self._cache.get(key)
+    
+    def _put(self, key: str, vector: List[float]) -> None:
+        with self._lock:
+            self._cache[key] = tuple(vector)
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents without caching."""
+        return self.embeddings.embed_documents(texts)
+    
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query, reusing a cached vector for text seen before."""
+        key = content_key(text)
+        vector = self._get(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self._put(key, vector)
+        return list(vector)
+    
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed several queries, computing only the uncached ones in one batch."""
+        keys = [content_key(text) for text in texts]
+        vectors = [self._get(key) for key in keys]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        
+        if missing:
+            # Prefer a query-specific batch method so queries are not cached as documents
+            embed_batch = getattr(self.embeddings, "embed_queries", self.embeddings.embed_documents)
+            for i, vector in zip(missing, embed_batch([texts[i] for i in missing])):
+                self._put(keys[i], vector)
+                vectors[i] = vector
+        
+        return [list(vector) for vector in vectors]
+    
+    def clear(self) -> None:
+        """Drop all cached query vectors, e.g. after the model or index changes."""
+        with self._lock:
+            self._cache.clear()
+        logger.info("Cleared query embedding cache")
@@ -0,0 +1,159 @@
+"""Concurrency helpers for the async LLM and retrieval paths.
+
+Also provides the circuit breaker and rate limiter guarding Gemini calls.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Semaphores per event loop; asyncio primitives cannot be shared across loops
+_loop_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def loop_semaphore(name: str, limit: int) -> asyncio.Semaphore:
+    """Get the semaphore called ``name`` for the running event loop.
+    
+    Each ``asyncio.run`` gets fresh semaphores, so components can be driven
+    from successive event loops (e.g. one per daemon cycle).
+    """
+    semaphores = _loop_semaphores.setdefault(asyncio.get_running_loop(), {})
+    semaphore = semaphores.get(name)
+    if semaphore is None:
+        semaphore = semaphores[name] = asyncio.Semaphore(limit)
+    return semaphore
+
+
+def llm_semaphore() -> asyncio.Semaphore:
+    """Get the semaphore bounding concurrent Gemini calls on this loop."""
+    return loop_semaphore("llm", config.max_concurrent_llm)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Fail fast after repeated failures instead of waiting out every timeout.
+    
+    After ``fail_max`` consecutive failures the circuit opens and calls are
+    rejected for ``reset_timeout`` seconds. After that a single call is let
+    through as a trial while the rest keep being rejected; success closes the
+    circuit, failure reopens it. A trial that never reports back frees the
+    next trial slot after another ``reset_timeout``.
+    """
+    
+    def __init__(self, name: str, fail_max: int, reset_timeout: float):
+        self.name = name
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+    
+    def before_call(self) -> None:
+        """Raise CircuitOpenError if calls are currently rejected."""
+        with self._lock:
+            if self._failures < self.fail_max:
+                return
+            now = time.monotonic()
+            if now - self._opened_at < self.reset_timeout:
+                raise CircuitOpenError(f"{self.name} circuit is open")
+            # Half-open: let this call through as the trial and hold back the rest
+            self._opened_at = now
+    
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+    
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.fail_max:
+                if self._failures == self.fail_max:
+                    logger.warning("%s circuit opened after %s failures", self.name, self._failures)
+                self._opened_at = time.monotonic()
+
+
+class RateLimiter:
+    """Thread-safe token bucket allowing ``rate`` calls per ``period`` seconds."""
+    
+    def __init__(self, rate: float, period: float = 1.0):
+        self.rate = rate
+        self.period = period
+        self._tokens = rate
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _reserve(self) -> float:
+        """Take a token, returning how long to wait before it is available."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate / self.period)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens * self.period / self.rate
+    
+    def acquire(self) -> None:
+        delay = self._reserve()
+        if delay:
+            time.sleep(delay)
+    
+    async def aacquire(self) -> None:
+        delay = self._reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+
+class LLMGuard:
+    """Rate limit and circuit breaker shared by every Gemini call in the process."""
+    
+    def __init__(self):
+        self.breaker = CircuitBreaker(
+            "Gemini",
+            fail_max=config.llm_breaker_fail_max,
+            reset_timeout=config.llm_breaker_reset_seconds
+        )
+        self.limiter = RateLimiter(config.llm_requests_per_second)
+    
+    def call(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Call ``fn`` through the rate limiter and circuit breaker."""
+        self.breaker.before_call()
+        self.limiter.acquire()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return result
+    
+    async def acall(self, fn: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any) -> T:
+        """Await ``fn`` through the concurrency bound, rate limiter and circuit breaker."""
+        self.breaker.before_call()
+        async with llm_semaphore():
+            await self.limiter.aacquire()
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception:
+                self.breaker.record_failure()
+                raise
+        self.breaker.record_success()
+        return result
+
+
+# Global guard for Gemini calls
+llm_guard = LLMGuard()
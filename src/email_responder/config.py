@@ -1,7 +1,10 @@
 """Configuration management for the email responder system."""
 
+import hashlib
+import json
 import os
-from typing import Optional
+from pathlib import Path
+from typing import Dict, Optional
 from pydantic_settings import BaseSettings
 from pydantic import Field
 from dotenv import load_dotenv
@@ -21,11 +24,21 @@ class Config(BaseSettings):
     gmail_credentials_path: str = Field(default="credentials.json", description="Gmail credentials file path")
     gmail_token_path: str = Field(default="token.json", description="Gmail token file path")
     gmail_email_address: str = Field(default="", description="Gmail email address")
+    gmail_fetch_concurrency: int = Field(default=10, description="Maximum concurrent Gmail message GET requests")
+    gmail_send_concurrency: int = Field(default=10, description="Maximum concurrent Gmail send requests")
+    plain_text_domains: str = Field(default="", description="Comma-separated recipient domains that get plain-text-only replies")
+    gmail_query: str = Field(
+        default="-from:noreply -from:no-reply -from:mailer-daemon -category:promotions",
+        description="Extra Gmail search terms used to filter unread emails server-side"
+    )
     
     # Vector Database Configuration
     vector_db_type: str = Field(default="chroma", description="Vector database type")
     vector_db_path: str = Field(default="./data/chroma_db", description="Vector database path")
+    faiss_db_path: str = Field(default="./data/faiss_db", description="FAISS index path, used when vector_db_type is faiss")
     embedding_model: str = Field(default="sentence-transformers/all-MiniLM-L6-v2", description="Embedding model name")
+    embedding_backend: str = Field(default="huggingface", description="Embedding runtime: huggingface or onnx")
+    onnx_model_dir: str = Field(default="./data/onnx_model", description="Directory for the exported int8 ONNX embedding model")
     
     # Document Processing Configuration
     chunk_size: int = Field(default=1000, description="Document chunk size for splitting")
@@ -36,12 +49,21 @@ class Config(BaseSettings):
     # Redis Configuration
     redis_url: str = Field(default="redis://localhost:6379/0", description="Redis URL")
     use_redis_cache: bool = Field(default=False, description="Use Redis for caching")
+    redis_pool_size: int = Field(default=16, description="Maximum Redis connections in the pool")
     
     # Application Configuration
     log_level: str = Field(default="INFO", description="Logging level")
     batch_size: int = Field(default=10, description="Email batch size")
     processing_interval_minutes: int = Field(default=5, description="Processing interval in minutes")
     max_response_length: int = Field(default=500, description="Maximum response length")
+    workflow_checkpointing: bool = Field(default=False, description="Checkpoint workflow state so sessions can be resumed")
+    use_batch_api: bool = Field(default=False, description="Generate workflow responses through the Gemini Batch API")
+    batch_poll_interval_seconds: int = Field(default=30, description="Polling interval for Gemini batch jobs")
+    batch_timeout_minutes: int = Field(default=60, description="Maximum time to wait for a Gemini batch job")
+    max_concurrent_llm: int = Field(default=8, description="Maximum concurrent Gemini requests in async processing")
+    llm_requests_per_second: float = Field(default=5.0, description="Maximum Gemini requests per second")
+    llm_breaker_fail_max: int = Field(default=5, description="Consecutive Gemini failures before failing fast")
+    llm_breaker_reset_seconds: int = Field(default=30, description="Seconds to fail fast before retrying Gemini")
     
     # Safety and Content Configuration
     enable_safety_checks: bool = Field(default=True, description="Enable safety checks")
@@ -49,7 +71,14 @@ class Config(BaseSettings):
     
     # Performance Configuration
     cache_ttl_hours: int = Field(default=24, description="Cache TTL in hours")
+    memory_cache_max_entries: int = Field(default=10000, description="Maximum entries in the in-memory cache")
     max_emails_per_batch: int = Field(default=50, description="Maximum emails per batch")
+    semantic_cache_enabled: bool = Field(default=False, description="Reuse responses for semantically similar prompts (stores replies on disk)")
+    semantic_cache_threshold: float = Field(default=0.93, description="Minimum cosine similarity for a semantic cache hit")
+    semantic_cache_path: str = Field(default="./data/semantic_cache", description="Directory for the persisted semantic cache")
+    semantic_cache_max_entries: int = Field(default=5000, description="Maximum responses kept in the semantic cache")
+    embedding_cache_size: int = Field(default=4096, description="Query embeddings kept in memory for reuse")
+    keyword_confidence_threshold: float = Field(default=0.6, description="Keyword intent confidence above which retrieval skips LLM query generation")
     
     model_config = {
         "env_file": ".env",
@@ -58,13 +87,86 @@ class Config(BaseSettings):
     }
 
 
+# Resolved settings cache used when FAST_CONFIG is enabled
+CONFIG_CACHE_PATH = Path(".cache/config.json")
+
+# Settings that may hold credentials; never written to the cache, read from the environment on load
+SECRET_FIELDS = ("google_api_key", "redis_url")
+
+
+def _fast_config_enabled() -> bool:
+    """Check whether the on-disk config cache should be used."""
+    return os.getenv("FAST_CONFIG", "").lower() in ("1", "true", "yes")
+
+
+def _env_file_mtime() -> Optional[float]:
+    """Get the modification time of the .env file, if it exists."""
+    try:
+        return os.stat(".env").st_mtime
+    except OSError:
+        return None
+
+
+def _config_fingerprint() -> str:
+    """Digest of everything the resolved settings depend on.
+    
+    Covers the .env modification time, the environment variables that map
+    to settings fields, and the fields themselves (name, type and default),
+    so a changed variable or a changed ``Config`` schema invalidates the cache.
+    """
+    fields = Config.model_fields
+    environment = sorted((name, value) for name, value in os.environ.items() if name.lower() in fields)
+    schema = [(name, repr(field.annotation), repr(field.default)) for name, field in fields.items()]
+    payload = json.dumps([_env_file_mtime(), environment, schema, SECRET_FIELDS])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _secret_values() -> Dict[str, str]:
+    """Read the secret settings from the environment (``load_dotenv`` has merged .env into it)."""
+    return {name.lower(): value for name, value in os.environ.items() if name.lower() in SECRET_FIELDS}
+
+
+def _load_cached_config() -> Optional[Config]:
+    """Load previously validated settings, skipping pydantic validation.
+    
+    The cache is only used while its fingerprint matches, i.e. the values
+    were validated by the same schema from the same inputs. Secret fields
+    are not cached and are taken from the environment instead.
+    """
+    try:
+        with open(CONFIG_CACHE_PATH, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    
+    if cached.get("fingerprint") != _config_fingerprint():
+        return None
+    return Config.model_construct(**{**cached["values"], **_secret_values()})
+
+
+def _save_cached_config(settings: Config) -> None:
+    """Persist validated settings for the next fast-config run."""
+    try:
+        CONFIG_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(CONFIG_CACHE_PATH, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({"fingerprint": _config_fingerprint(), "values": settings.model_dump(exclude=set(SECRET_FIELDS))}, f)
+    except OSError as e:
+        print(f"Warning: Could not write config cache: {e}")
+
+
 # Global config instance - wrap in try-catch for missing required fields
-try:
-    config = Config()
-except Exception as e:
-    print(f"Warning: Configuration error: {e}")
-    print("Please check your .env file or environment variables.")
-    config = Config(
-        google_api_key="",
-        gmail_email_address=""
-    ) 
\ No newline at end of file
+config = _load_cached_config() if _fast_config_enabled() else None
+if config is None:
+    try:
+        config = Config()
+    except Exception as e:
+        print(f"Warning: Configuration error: {e}")
+        print("Please check your .env file or environment variables.")
+        config = Config(
+            google_api_key="",
+            gmail_email_address=""
+        )
+    
+    if _fast_config_enabled():
+        _save_cached_config(config)
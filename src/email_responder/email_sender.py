@@ -1,90 +1,134 @@
 """Email Sender using Gmail API with FastMCP integration."""
 
+import asyncio
 import logging
-import base64
 import json
 import os
+import re
+import uuid
+import weakref
 from typing import Optional, Dict, Any
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from email.header import Header
 
 from fastmcp import FastMCP
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+import httpx
+import pybase64
 from googleapiclient.errors import HttpError
 
+from . import gmail_auth
+from .concurrency import loop_semaphore
 from .config import config
+from .mcp_app import mcp_server as shared_mcp_server
 
 logger = logging.getLogger(__name__)
 
+# Gmail REST endpoint used for async sends
+GMAIL_SEND_URL = 'https://gmail.googleapis.com/gmail/v1/users/me/messages/send'
+
+# Static HTML wrapper for the HTML alternative of each reply
+_HTML_PREFIX = """<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <style>
+        body {
+            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+            line-height: 1.6;
+            color: #333;
+            max-width: 600px;
+            margin: 0 auto;
+            padding: 20px;
+        }
+        p {
+            margin-bottom: 15px;
+        }
+        .signature {
+            margin-top: 30px;
+            padding-top: 20px;
+            border-top: 1px solid #ddd;
+            color: #666;
+            font-size: 14px;
+        }
+    </style>
+</head>
+<body>
+    <p>"""
+_HTML_SUFFIX = """</p>
+</body>
+</html>
+"""
+
+# Paragraph breaks become </p><p>, single newlines become <br>
+_NEWLINES_RE = re.compile(r'\n\n|\n')
+
+# Multipart boundary; the random suffix keeps it from occurring in a reply body
+_BOUNDARY = f"=_auto_responder_{uuid.uuid4().hex}"
+
+
+def _header_value(value: str) -> str:
+    """Replace CR/LF so a value cannot inject additional headers."""
+    return value.replace('\r', ' ').replace('\n', ' ')
+
+
+def _encode_header(value: str) -> str:
+    """Encode a header value, using RFC 2047 for non-ASCII text."""
+    value = _header_value(value)
+    if value.isascii():
+        return value
+    return Header(value, 'utf-8').encode(linesep='\r\n')
+
+
+def _to_crlf(text: str) -> str:
+    """Normalize line endings to CRLF."""
+    return text.replace('\r\n', '\n').replace('\n', '\r\n')
+
+
+def _base64_body(text: str) -> str:
+    """Encode a MIME part body as base64 in 76-character lines.
+    
+    Keeps every line far below RFC 5322's 998-octet limit, however long the
+    reply; the HTML alternative in particular is a single line of markup.
+    """
+    encoded = pybase64.b64encode(_to_crlf(text).encode('utf-8')).decode('ascii')
+    return "\r\n".join(encoded[start:start + 76] for start in range(0, len(encoded), 76))
+
 
 class EmailSender:
     """Handles sending email responses using Gmail API."""
     
-    SCOPES = ['https://www.googleapis.com/auth/gmail.send']
+    SCOPES = gmail_auth.SCOPES
     
-    def __init__(self):
+    def __init__(self, mcp_server: Optional[FastMCP] = None):
         self.service = None
-        self.mcp_server = None
+        self.credentials = None
+        self.mcp_server = mcp_server or shared_mcp_server
+        self._plain_text_domains = frozenset(
+            domain.strip().lower() for domain in config.plain_text_domains.split(',') if domain.strip()
+        )
+        # Persistent async clients, one per event loop
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
         self._initialize_gmail_service()
+        # Checked once after authentication (which writes the token) rather
+        # than on every status poll; the files are not removed at runtime
+        self._credentials_exists = os.path.isfile(config.gmail_credentials_path)
+        self._token_exists = os.path.isfile(config.gmail_token_path)
         self._setup_mcp_server()
     
     def _initialize_gmail_service(self) -> None:
         """Initialize Gmail API service with authentication."""
         try:
-            creds = None
-            
-            # Load existing token
-            if os.path.exists(config.gmail_token_path):
-                try:
-                    creds = Credentials.from_authorized_user_file(
-                        config.gmail_token_path, 
-                        self.SCOPES
-                    )
-                except Exception as e:
-                    logger.warning(f"Failed to load existing token: {e}")
-            
-            # Refresh or obtain new credentials
-            if not creds or not creds.valid:
-                if creds and creds.expired and creds.refresh_token:
-                    try:
-                        creds.refresh(Request())
-                        logger.info("Refreshed Gmail credentials")
-                    except Exception as e:
-                        logger.warning(f"Failed to refresh credentials: {e}")
-                        creds = None
-                
-                if not creds:
-                    if not os.path.exists(config.gmail_credentials_path):
-                        logger.error(f"Gmail credentials file not found: {config.gmail_credentials_path}")
-                        return
-                    
-                    flow = InstalledAppFlow.from_client_secrets_file(
-                        config.gmail_credentials_path, 
-                        self.SCOPES
-                    )
-                    creds = flow.run_local_server(port=0)
-                    logger.info("Obtained new Gmail credentials")
-                
-                # Save credentials for future use
-                with open(config.gmail_token_path, 'w') as token:
-                    token.write(creds.to_json())
-                logger.info(f"Saved credentials to {config.gmail_token_path}")
-            
-            # Build Gmail service
-            self.service = build('gmail', 'v1', credentials=creds)
-            logger.info("Gmail sender service initialized successfully")
-            
+            self.credentials = gmail_auth.get_credentials()
+            self.service = gmail_auth.get_service()
+            if self.service:
+                logger.info("Gmail sender service initialized successfully")
         except Exception as e:
-            logger.error(f"Failed to initialize Gmail service: {e}")
+            logger.error("Failed to initialize Gmail service: %s", e)
     
     def _setup_mcp_server(self) -> None:
-        """Setup FastMCP server for email sending operations."""
+        """Register the email sending tools on the FastMCP server."""
         try:
-            self.mcp_server = FastMCP("Gmail Email Sender")
-            
             @self.mcp_server.tool()
             def send_email_response(
                 to_email: str,
@@ -124,14 +168,14 @@ class EmailSender:
                     "service_ready": self.service is not None,
                     "sender_email": config.gmail_email_address,
                     "scopes": self.SCOPES,
-                    "credentials_configured": os.path.exists(config.gmail_credentials_path),
-                    "token_exists": os.path.exists(config.gmail_token_path)
+                    "credentials_configured": self._credentials_exists,
+                    "token_exists": self._token_exists or self.credentials is not None
                 }
             
-            logger.info("FastMCP email sender server setup complete")
+            logger.info("Registered email sender tools on the FastMCP server")
             
         except Exception as e:
-            logger.error(f"Failed to setup MCP server: {e}")
+            logger.error("Failed to setup MCP server: %s", e)
     
     def _send_email_impl(
         self,
@@ -139,7 +183,8 @@ class EmailSender:
         subject: str,
         body: str,
         in_reply_to: Optional[str] = None,
-        thread_id: Optional[str] = None
+        thread_id: Optional[str] = None,
+        prefer_plain: bool = False
     ) -> Dict[str, Any]:
         """Internal implementation for sending emails."""
         
@@ -154,25 +199,20 @@ class EmailSender:
                 to_email=to_email,
                 subject=subject,
                 body=body,
-                in_reply_to=in_reply_to
+                in_reply_to=in_reply_to,
+                prefer_plain=prefer_plain
             )
             
-            # Send email
+            # Send as part of the existing thread if one is given
             if thread_id:
-                # Send as part of existing thread
-                sent_message = self.service.users().messages().send(
-                    userId='me',
-                    body=message,
-                    threadId=thread_id
-                ).execute()
-            else:
-                # Send as new thread
-                sent_message = self.service.users().messages().send(
-                    userId='me',
-                    body=message
-                ).execute()
+                message['threadId'] = thread_id
+            
+            sent_message = self.service.users().messages().send(
+                userId='me',
+                body=message
+            ).execute()
             
-            logger.info(f"Email sent successfully to {to_email} - Message ID: {sent_message['id']}")
+            logger.info("Email sent successfully to %s - Message ID: %s", to_email, sent_message['id'])
             
             return {
                 "success": True,
@@ -196,73 +236,72 @@ class EmailSender:
         to_email: str,
         subject: str,
         body: str,
-        in_reply_to: Optional[str] = None
+        in_reply_to: Optional[str] = None,
+        prefer_plain: bool = False
     ) -> Dict[str, str]:
-        """Create email message in Gmail API format."""
+        """Create email message in Gmail API format.
         
-        # Create MIME message
-        message = MIMEMultipart('alternative')
-        message['To'] = to_email
-        message['From'] = config.gmail_email_address
-        message['Subject'] = subject
+        The multipart/alternative document is assembled directly as an RFC 5322
+        string rather than through the ``email`` package's MIME tree. Plain-text
+        correspondents (``prefer_plain`` or a configured plain-text domain) get
+        a single text/plain body without the HTML alternative.
+        """
+        headers = (
+            f"To: {_header_value(to_email)}\r\n"
+            f"From: {_header_value(config.gmail_email_address)}\r\n"
+            f"Subject: {_encode_header(subject)}\r\n"
+        )
         
         if in_reply_to:
-            message['In-Reply-To'] = in_reply_to
-            message['References'] = in_reply_to
+            reference = _header_value(in_reply_to)
+            headers += f"In-Reply-To: {reference}\r\nReferences: {reference}\r\n"
         
-        # Add HTML and plain text versions
-        text_part = MIMEText(body, 'plain', 'utf-8')
-        html_body = self._convert_to_html(body)
-        html_part = MIMEText(html_body, 'html', 'utf-8')
+        headers += "MIME-Version: 1.0\r\n"
         
-        message.attach(text_part)
-        message.attach(html_part)
+        if prefer_plain or self._is_plain_text_recipient(to_email):
+            headers += (
+                "Content-Type: text/plain; charset=utf-8\r\n"
+                "Content-Transfer-Encoding: base64\r\n"
+                "\r\n"
+            )
+            parts = f"{_base64_body(body)}\r\n"
+        else:
+            headers += (
+                f"Content-Type: multipart/alternative; boundary=\"{_BOUNDARY}\"\r\n"
+                "\r\n"
+            )
+            # Add plain text and HTML versions
+            parts = (
+                f"--{_BOUNDARY}\r\n"
+                "Content-Type: text/plain; charset=utf-8\r\n"
+                "Content-Transfer-Encoding: base64\r\n"
+                "\r\n"
+                f"{_base64_body(body)}\r\n"
+                f"--{_BOUNDARY}\r\n"
+                "Content-Type: text/html; charset=utf-8\r\n"
+                "Content-Transfer-Encoding: base64\r\n"
+                "\r\n"
+                f"{_base64_body(self._convert_to_html(body))}\r\n"
+                f"--{_BOUNDARY}--\r\n"
+            )
         
         # Encode message
-        raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode('utf-8')
+        raw_message = pybase64.urlsafe_b64encode((headers + parts).encode('utf-8')).decode('ascii')
         
         return {'raw': raw_message}
     
+    def _is_plain_text_recipient(self, to_email: str) -> bool:
+        """Check whether the recipient's domain is configured for plain-text replies."""
+        return to_email.rpartition('@')[2].strip().strip('>').lower() in self._plain_text_domains
+    
     def _convert_to_html(self, text_body: str) -> str:
         """Convert plain text email to HTML format."""
-        
-        # Simple text to HTML conversion
-        html_body = text_body.replace('\n\n', '</p><p>')
-        html_body = html_body.replace('\n', '<br>')
-        
-        html_template = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <style>
-                body {{
-                    font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-                    line-height: 1.6;
-                    color: #333;
-                    max-width: 600px;
-                    margin: 0 auto;
-                    padding: 20px;
-                }}
-                p {{
-                    margin-bottom: 15px;
-                }}
-                .signature {{
-                    margin-top: 30px;
-                    padding-top: 20px;
-                    border-top: 1px solid #ddd;
-                    color: #666;
-                    font-size: 14px;
-                }}
-            </style>
-        </head>
-        <body>
-            <p>{html_body}</p>
-        </body>
-        </html>
-        """
-        
-        return html_template
+        # Simple text to HTML conversion in a single pass over the body
+        html_body = _NEWLINES_RE.sub(
+            lambda match: '</p><p>' if match.group() == '\n\n' else '<br>',
+            text_body
+        )
+        return _HTML_PREFIX + html_body + _HTML_SUFFIX
     
     def send_response_email(
         self,
@@ -270,7 +309,8 @@ class EmailSender:
         subject: str,
         body: str,
         original_message_id: Optional[str] = None,
-        thread_id: Optional[str] = None
+        thread_id: Optional[str] = None,
+        prefer_plain: bool = False
     ) -> bool:
         """Send an email response (public interface).
         
@@ -280,25 +320,108 @@ class EmailSender:
             body: Email body content
             original_message_id: ID of original message being replied to
             thread_id: Gmail thread ID for conversation threading
+            prefer_plain: Send a text/plain-only message without the HTML part
         
         Returns:
             bool: True if email was sent successfully, False otherwise
         """
         
-        # Format subject for reply
-        if not subject.lower().startswith('re:'):
-            subject = f"Re: {subject}"
-        
         result = self._send_email_impl(
             to_email=to_email,
-            subject=subject,
+            subject=self._reply_subject(subject),
             body=body,
             in_reply_to=original_message_id,
-            thread_id=thread_id
+            thread_id=thread_id,
+            prefer_plain=prefer_plain
         )
         
         return result.get('success', False)
     
+    async def send_response_email_async(
+        self,
+        to_email: str,
+        subject: str,
+        body: str,
+        original_message_id: Optional[str] = None,
+        thread_id: Optional[str] = None,
+        prefer_plain: bool = False
+    ) -> bool:
+        """Send an email response without blocking the event loop.
+        
+        Takes the same arguments as ``send_response_email``. Sends share one
+        persistent HTTP/2 connection per event loop, so only the first pays
+        for the TLS handshake, and at most ``config.gmail_send_concurrency``
+        are in flight at once.
+        """
+        if not self.credentials:
+            logger.error("Gmail service not initialized")
+            return False
+        
+        await gmail_auth.aensure_fresh_credentials(self.credentials)
+        
+        # Bound in-flight sends to stay within per-user Gmail quotas
+        async with loop_semaphore("gmail_send", config.gmail_send_concurrency):
+            return await self._send_email_async(
+                self._async_client(),
+                to_email=to_email,
+                subject=subject,
+                body=body,
+                original_message_id=original_message_id,
+                thread_id=thread_id,
+                prefer_plain=prefer_plain
+            )
+    
+    def _async_client(self) -> httpx.AsyncClient:
+        """Get the persistent Gmail client of the running event loop."""
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = self._clients[loop] = gmail_auth.async_client(self.credentials)
+        return client
+    
+    async def aclose(self) -> None:
+        """Close the running event loop's client; call before the loop shuts down."""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+    
+    async def _send_email_async(
+        self,
+        client: httpx.AsyncClient,
+        to_email: str,
+        subject: str,
+        body: str,
+        original_message_id: Optional[str] = None,
+        thread_id: Optional[str] = None,
+        prefer_plain: bool = False
+    ) -> bool:
+        """POST a single reply to the Gmail send endpoint."""
+        message = self._create_message(
+            to_email=to_email,
+            subject=self._reply_subject(subject),
+            body=body,
+            in_reply_to=original_message_id,
+            prefer_plain=prefer_plain
+        )
+        if thread_id:
+            message['threadId'] = thread_id
+        
+        try:
+            response = await client.post(GMAIL_SEND_URL, json=message)
+            response.raise_for_status()
+            logger.info("Email sent successfully to %s - Message ID: %s", to_email, response.json()['id'])
+            return True
+        except httpx.HTTPError as e:
+            logger.error("Gmail API error sending to %s: %s", to_email, e)
+            return False
+    
+    @staticmethod
+    def _reply_subject(subject: str) -> str:
+        """Prefix the subject with "Re:" if not already."""
+        if not subject.lower().startswith('re:'):
+            return f"Re: {subject}"
+        return subject
+    
     def test_connection(self) -> bool:
         """Test if the Gmail sender is working properly."""
         if not self.service:
@@ -307,10 +430,10 @@ class EmailSender:
         try:
             # Try to get user profile to test connection
             profile = self.service.users().getProfile(userId='me').execute()
-            logger.info(f"Gmail sender test successful - Email: {profile.get('emailAddress')}")
+            logger.info("Gmail sender test successful - Email: %s", profile.get('emailAddress'))
             return True
         except Exception as e:
-            logger.error(f"Gmail sender test failed: {e}")
+            logger.error("Gmail sender test failed: %s", e)
             return False
     
     def get_mcp_server(self) -> Optional[FastMCP]:
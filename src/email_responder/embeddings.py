@@ -0,0 +1,157 @@
+"""ONNX Runtime sentence embeddings for the policy retriever."""
+
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import onnxruntime as ort
+from langchain_core.embeddings import Embeddings
+from tokenizers import Tokenizer
+
+from .cache_manager import content_key
+
+logger = logging.getLogger(__name__)
+
+# Quantized model file inside the ONNX model directory
+QUANTIZED_MODEL_FILE = "model_int8.onnx"
+
+# Pre-tokenized policy chunks inside the ONNX model directory
+TOKEN_CACHE_FILE = "token_cache.npz"
+
+# Texts encoded per inference call
+EMBEDDING_BATCH_SIZE = 32
+
+# Maximum sequence length of all-MiniLM-L6-v2
+MAX_SEQ_LENGTH = 256
+
+
+def export_onnx_model(model_name: str, model_dir: str) -> Path:
+    """Export a sentence-transformers model to ONNX and quantize it to int8.
+    
+    Only needed once per model; requires ``optimum[onnxruntime]``.
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from optimum.onnxruntime import ORTModelForFeatureExtraction
+    from transformers import AutoTokenizer
+    
+    output_dir = Path(model_dir)
+    model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+    model.save_pretrained(output_dir)
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(output_dir)
+    
+    quantized_path = output_dir / QUANTIZED_MODEL_FILE
+    quantize_dynamic(output_dir / "model.onnx", quantized_path, weight_type=QuantType.QInt8)
+    logger.info("Exported quantized ONNX model to %s", quantized_path)
+    return quantized_path
+
+
+class OnnxEmbeddings(Embeddings):
+    """Mean-pooled, L2-normalized sentence embeddings computed with ONNX Runtime.
+    
+    Produces the same vectors as the sentence-transformers pipeline for
+    MiniLM-style models, without dispatching through PyTorch.
+    """
+    
+    def __init__(self, model_name: str, model_dir: str):
+        model_path = Path(model_dir) / QUANTIZED_MODEL_FILE
+        if not model_path.exists():
+            model_path = export_onnx_model(model_name, model_dir)
+        
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = os.cpu_count() or 1
+        self.session = ort.InferenceSession(
+            str(model_path),
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        
+        # Rust tokenizer; sequences are padded per batch in _encode
+        self.tokenizer = Tokenizer.from_file(str(Path(model_dir) / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.no_padding()
+        
+        self._token_cache_path = Path(model_dir) / TOKEN_CACHE_FILE
+        self._token_cache = self._load_token_cache()
+        logger.info("Loaded ONNX embedding model from %s", model_path)
+    
+    def _load_token_cache(self) -> Dict[str, np.ndarray]:
+        """Load token ids of previously embedded documents."""
+        if not self._token_cache_path.exists():
+            return {}
+        try:
+            with np.load(self._token_cache_path) as data:
+                return {key: data[key] for key in data.files}
+        except Exception as e:
+            logger.warning("Failed to load token cache: %s", e)
+            return {}
+    
+    def _save_token_cache(self) -> None:
+        """Persist the token cache so re-indexing skips unchanged chunks."""
+        try:
+            np.savez(self._token_cache_path, **self._token_cache)
+        except Exception as e:
+            logger.warning("Failed to save token cache: %s", e)
+    
+    def _tokenize(self, texts: List[str]) -> List[np.ndarray]:
+        """Tokenize texts into (3, length) arrays of ids, attention mask and type ids."""
+        return [
+            np.array([encoding.ids, encoding.attention_mask, encoding.type_ids], dtype=np.int64)
+            for encoding in self.tokenizer.encode_batch(texts)
+        ]
+    
+    def _tokenize_cached(self, texts: List[str]) -> List[np.ndarray]:
+        """Tokenize documents, reusing token ids cached by content hash."""
+        keys = [content_key(text) for text in texts]
+        missing = [i for i, key in enumerate(keys) if key not in self._token_cache]
+        
+        if missing:
+            for i, tokens in zip(missing, self._tokenize([texts[i] for i in missing])):
+                self._token_cache[keys[i]] = tokens
+            self._save_token_cache()
+        
+        return [self._token_cache[key] for key in keys]
+    
+    def _encode(self, rows: List[np.ndarray]) -> np.ndarray:
+        """Embed one batch of tokenized texts."""
+        # Pad to the longest sequence in the batch
+        length = max(row.shape[1] for row in rows)
+        batch = np.zeros((3, len(rows), length), dtype=np.int64)
+        for i, row in enumerate(rows):
+            batch[:, i, :row.shape[1]] = row
+        
+        tokens = {"input_ids": batch[0], "attention_mask": batch[1], "token_type_ids": batch[2]}
+        inputs = {name: tokens[name] for name in self.input_names if name in tokens}
+        hidden = self.session.run(None, inputs)[0]
+        
+        # Mean pooling over real tokens, then L2 normalization
+        mask = tokens["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents in batches.
+        
+        Policy chunks are stable, so their token ids are cached on disk.
+        """
+        if not texts:
+            return []
+        
+        rows = self._tokenize_cached(texts)
+        batches = [
+            self._encode(rows[start:start + EMBEDDING_BATCH_SIZE])
+            for start in range(0, len(rows), EMBEDDING_BATCH_SIZE)
+        ]
+        return np.concatenate(batches).tolist()
+    
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single query."""
+        return self._encode(self._tokenize([text]))[0].tolist()
+    
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed several queries in one batch without touching the token cache."""
+        if not texts:
+            return []
+        return self._encode(self._tokenize(texts)).tolist()
@@ -0,0 +1,110 @@
+"""In-process FAISS HNSW vector store for the policy corpus."""
+
+import json
+import logging
+import os
+from typing import Any, Dict, List
+
+import faiss
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+
+logger = logging.getLogger(__name__)
+
+# HNSW graph parameters
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+
+class FaissPolicyStore:
+    """Policy chunks in a FAISS HNSW index, searched by cosine similarity.
+    
+    Avoids Chroma's SQLite and marshaling overhead, which dominates query
+    time for a corpus this small. Document vectors are L2-normalized once
+    at insert and query embeddings are already unit length, so inner
+    product equals cosine similarity with no per-query normalization.
+    """
+    
+    INDEX_FILE = "index.faiss"
+    DOCUMENTS_FILE = "documents.json"
+    
+    def __init__(self, index: Any, documents: List[Document], embeddings: Embeddings):
+        self.index = index
+        self.documents = documents
+        self.embeddings = embeddings
+        self.index.hnsw.efSearch = HNSW_EF_SEARCH
+    
+    @classmethod
+    def exists(cls, path: str) -> bool:
+        """Check whether a persisted store exists at ``path``."""
+        return os.path.exists(os.path.join(path, cls.INDEX_FILE))
+    
+    @classmethod
+    def from_documents(cls, documents: List[Document], embeddings: Embeddings, path: str) -> "FaissPolicyStore":
+        """Embed documents, build the HNSW index and persist it to ``path``."""
+        vectors = cls._as_matrix(embeddings.embed_documents([doc.page_content for doc in documents]))
+        faiss.normalize_L2(vectors)
+        
+        index = faiss.IndexHNSWFlat(vectors.shape[1], HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.add(vectors)
+        
+        store = cls(index, documents, embeddings)
+        store.save(path)
+        return store
+    
+    @classmethod
+    def load(cls, path: str, embeddings: Embeddings) -> "FaissPolicyStore":
+        """Load a persisted store."""
+        index = faiss.read_index(os.path.join(path, cls.INDEX_FILE))
+        with open(os.path.join(path, cls.DOCUMENTS_FILE), 'r', encoding='utf-8') as f:
+            documents = [Document(page_content=text, metadata=metadata) for text, metadata in json.load(f)]
+        return cls(index, documents, embeddings)
+    
+    def save(self, path: str) -> None:
+        """Persist the index and its documents."""
+        os.makedirs(path, exist_ok=True)
+        faiss.write_index(self.index, os.path.join(path, self.INDEX_FILE))
+        with open(os.path.join(path, self.DOCUMENTS_FILE), 'w', encoding='utf-8') as f:
+            json.dump([(doc.page_content, doc.metadata) for doc in self.documents], f)
+    
+    @staticmethod
+    def _as_matrix(vectors: List[List[float]]) -> np.ndarray:
+        """Convert embeddings to a contiguous float32 matrix."""
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+    
+    def search_by_vectors(self, vectors: List[List[float]], k: int) -> List[List[Document]]:
+        """Return the top ``k`` documents for each query vector."""
+        _, ids = self.index.search(self._as_matrix(vectors), k)
+        return [[self.documents[i] for i in row if i >= 0] for row in ids]
+    
+    def similarity_search(self, query: str, k: int = 4) -> List[Document]:
+        """Return the top ``k`` documents for a query."""
+        return self.search_by_vectors([self.embeddings.embed_query(query)], k)[0]
+    
+    def count(self) -> int:
+        """Number of indexed chunks."""
+        return self.index.ntotal
+    
+    def as_retriever(self, search_kwargs: Dict[str, Any] = None, **kwargs: Any) -> "FaissRetriever":
+        """Wrap the store in a LangChain retriever."""
+        return FaissRetriever(store=self, k=(search_kwargs or {}).get("k", 4))
+
+
+class FaissRetriever(BaseRetriever):
+    """LangChain retriever over a FaissPolicyStore."""
+    
+    store: Any
+    k: int = 4
+    
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self.store.similarity_search(query, self.k)
@@ -0,0 +1,203 @@
+"""Shared Gmail API authentication for the fetcher and sender."""
+
+import asyncio
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Any, AsyncGenerator, Generator, Optional
+
+import httpx
+
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from google_auth_oauthlib.flow import InstalledAppFlow
+from googleapiclient.discovery import build
+
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+# Gmail API scopes (union of what the fetcher and sender need)
+SCOPES = [
+    'https://www.googleapis.com/auth/gmail.readonly',
+    'https://www.googleapis.com/auth/gmail.modify',
+    'https://www.googleapis.com/auth/gmail.send'
+]
+
+# Refresh the access token this long before it actually expires
+REFRESH_MARGIN = timedelta(minutes=5)
+
+_lock = threading.RLock()
+_credentials: Optional[Credentials] = None
+_service: Optional[Any] = None
+
+
+def _load_credentials() -> Optional[Credentials]:
+    """Load, refresh or obtain Gmail OAuth credentials."""
+    creds = None
+
+    # Load existing token
+    if os.path.exists(config.gmail_token_path):
+        try:
+            creds = Credentials.from_authorized_user_file(config.gmail_token_path, SCOPES)
+        except Exception as e:
+            logger.warning("Failed to load existing token: %s", e)
+
+    # Refresh or obtain new credentials
+    if not creds or not creds.valid:
+        if creds and creds.expired and creds.refresh_token:
+            try:
+                creds.refresh(Request())
+                logger.info("Refreshed Gmail credentials")
+            except Exception as e:
+                logger.warning("Failed to refresh credentials: %s", e)
+                creds = None
+
+        if not creds:
+            if not os.path.exists(config.gmail_credentials_path):
+                logger.error("Gmail credentials file not found: %s", config.gmail_credentials_path)
+                return None
+
+            flow = InstalledAppFlow.from_client_secrets_file(config.gmail_credentials_path, SCOPES)
+            creds = flow.run_local_server(port=0)
+            logger.info("Obtained new Gmail credentials")
+
+        save_credentials(creds)
+
+    ensure_fresh_credentials(creds)
+    return creds
+
+
+def _expires_soon(creds: Credentials) -> bool:
+    """Check whether the access token expires within REFRESH_MARGIN."""
+    if not creds.valid:
+        return True
+    # google-auth stores expiry as a naive UTC datetime
+    return creds.expiry is not None and creds.expiry - datetime.utcnow() < REFRESH_MARGIN
+
+
+def ensure_fresh_credentials(creds: Optional[Credentials] = None) -> Optional[Credentials]:
+    """Refresh the access token ahead of expiry so a batch never hits a 401 mid-run."""
+    with _lock:
+        creds = creds or _credentials
+        if creds is None or not creds.refresh_token or not _expires_soon(creds):
+            return creds
+
+        try:
+            creds.refresh(Request())
+            save_credentials(creds)
+            logger.info("Proactively refreshed Gmail credentials")
+        except Exception as e:
+            logger.warning("Failed to refresh credentials: %s", e)
+        return creds
+
+
+async def aensure_fresh_credentials(creds: Optional[Credentials] = None) -> Optional[Credentials]:
+    """Async version of ``ensure_fresh_credentials``; the refresh runs in a worker thread."""
+    creds = creds or _credentials
+    if creds is None or not creds.refresh_token or not _expires_soon(creds):
+        return creds
+    return await asyncio.to_thread(ensure_fresh_credentials, creds)
+
+
+def refresh_credentials(creds: Credentials, rejected_token: Optional[str] = None) -> bool:
+    """Force a token refresh, e.g. after the API rejected the current one.
+    
+    When ``rejected_token`` is given and another caller has already replaced
+    it, the refresh is skipped, so concurrent 401s refresh the token once.
+    """
+    with _lock:
+        if rejected_token is not None and creds.token != rejected_token:
+            return True
+        if not creds.refresh_token:
+            return False
+        try:
+            creds.refresh(Request())
+            save_credentials(creds)
+            return True
+        except Exception as e:
+            logger.warning("Failed to refresh credentials: %s", e)
+            return False
+
+
+class GmailAuth(httpx.Auth):
+    """httpx auth flow sending the OAuth bearer token and refreshing it once on 401."""
+    
+    def __init__(self, creds: Credentials):
+        self.creds = creds
+    
+    def auth_flow(self, request: httpx.Request) -> Generator[httpx.Request, httpx.Response, None]:
+        token = self.creds.token
+        request.headers['Authorization'] = f'Bearer {token}'
+        response = yield request
+        
+        if response.status_code == 401 and refresh_credentials(self.creds, token):
+            logger.info("Gmail API returned 401, retrying with a refreshed token")
+            request.headers['Authorization'] = f'Bearer {self.creds.token}'
+            yield request
+    
+    async def async_auth_flow(self, request: httpx.Request) -> AsyncGenerator[httpx.Request, httpx.Response]:
+        """Async version of ``auth_flow``; the token refresh runs in a worker thread."""
+        token = self.creds.token
+        request.headers['Authorization'] = f'Bearer {token}'
+        response = yield request
+        
+        if response.status_code == 401 and await asyncio.to_thread(refresh_credentials, self.creds, token):
+            logger.info("Gmail API returned 401, retrying with a refreshed token")
+            request.headers['Authorization'] = f'Bearer {self.creds.token}'
+            yield request
+
+
+def async_client(creds: Credentials, **kwargs: Any) -> httpx.AsyncClient:
+    """Create an HTTP/2 async client authorized for the Gmail API.
+    
+    All concurrent requests of a batch are multiplexed over one connection.
+    """
+    kwargs.setdefault('timeout', 30.0)
+    return httpx.AsyncClient(http2=True, auth=GmailAuth(creds), **kwargs)
+
+
+def save_credentials(creds: Credentials) -> None:
+    """Save credentials for future runs.
+    
+    The token is written to a temporary file and moved into place, so a crash
+    mid-write never leaves a truncated token (and a forced re-auth) behind.
+    """
+    tmp_path = f"{config.gmail_token_path}.tmp"
+    try:
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_CLOEXEC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as token:
+            token.write(creds.to_json())
+            token.flush()
+            os.fsync(token.fileno())
+        os.replace(tmp_path, config.gmail_token_path)
+        logger.info("Saved credentials to %s", config.gmail_token_path)
+    except OSError as e:
+        logger.error("Failed to save credentials to %s: %s", config.gmail_token_path, e)
+
+
+def get_credentials() -> Optional[Credentials]:
+    """Get the process-wide Gmail credentials, authenticating on first use."""
+    global _credentials
+    with _lock:
+        if _credentials is None:
+            _credentials = _load_credentials()
+        return _credentials
+
+
+def get_service() -> Optional[Any]:
+    """Get the process-wide Gmail API service, building it on first use.
+
+    Discovery document caching is disabled; the oauth2client-based file cache
+    is unavailable with google-auth and only adds a failed disk lookup.
+    """
+    global _service
+    with _lock:
+        if _service is None:
+            creds = get_credentials()
+            if creds is None:
+                return None
+            _service = build('gmail', 'v1', credentials=creds, cache_discovery=False)
+            logger.info("Gmail service initialized successfully")
+        return _service
@@ -1,33 +1,61 @@
 """Gmail fetcher using MCP and Gmail API for batch email processing."""
 
+import asyncio
+import html
 import logging
 import json
 import os
-from typing import List, Dict, Any, Optional
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass
 from datetime import datetime, timedelta
+from email.header import decode_header, make_header
+from email.utils import parseaddr, parsedate_to_datetime
 
-import google.auth
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.errors import HttpError
+from googleapiclient.http import build_http
 from fastmcp import FastMCP
+import httpx
+import pybase64
 
+from . import gmail_auth
 from .config import config
+from .mcp_app import mcp_server as shared_mcp_server
 
 logger = logging.getLogger(__name__)
 
-# Gmail API scopes
-SCOPES = [
-    'https://www.googleapis.com/auth/gmail.readonly',
-    'https://www.googleapis.com/auth/gmail.modify',
-    'https://www.googleapis.com/auth/gmail.send'
-]
+# Gmail REST endpoint used by the async client
+GMAIL_API_URL = 'https://gmail.googleapis.com/gmail/v1/users/me'
 
+# Label added to emails that have been answered
+PROCESSED_LABEL = 'auto-responder-processed'
 
-@dataclass
+# Unread emails that have not been answered yet
+UNREAD_QUERY = f'is:unread -label:{PROCESSED_LABEL}'
+
+# Maximum sub-requests Gmail accepts in one batch HTTP request
+GMAIL_BATCH_LIMIT = 100
+
+# Maximum message ids Gmail accepts in one batchModify call
+GMAIL_BATCH_MODIFY_LIMIT = 1000
+
+# Headers requested when fetching message metadata only
+METADATA_HEADERS = ['Subject', 'From', 'Date', 'To', 'Auto-Submitted', 'X-Autoreply', 'Precedence']
+WANTED_HEADERS = frozenset(header.lower() for header in METADATA_HEADERS)
+
+# Precedence values set by mailing lists and bulk senders
+BULK_PRECEDENCE = frozenset({'bulk', 'junk', 'list', 'auto_reply'})
+
+# Used to reduce HTML-only bodies to plain text
+_HTML_TAG_RE = re.compile(r'<(script|style)\b[^>]*>.*?</\1>|<[^>]+>', re.IGNORECASE | re.DOTALL)
+_WHITESPACE_RE = re.compile(r'[ \t\r\f\v]+')
+
+
+@dataclass(slots=True)
 class EmailData:
     """Email data structure."""
     id: str
@@ -37,7 +65,9 @@ class EmailData:
     body: str
     timestamp: datetime
     thread_id: str
-    labels: List[str]
+    labels: Tuple[str, ...]
+    prefers_plain_text: bool = False
+    is_automated: bool = False
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary."""
@@ -49,53 +79,34 @@ class EmailData:
             'body': self.body,
             'timestamp': self.timestamp.isoformat(),
             'thread_id': self.thread_id,
-            'labels': self.labels
+            'labels': list(self.labels),
+            'prefers_plain_text': self.prefers_plain_text,
+            'is_automated': self.is_automated
         }
 
 
 class GmailFetcher:
     """Gmail fetcher with MCP and API integration."""
     
-    def __init__(self):
+    def __init__(self, mcp_server: Optional[FastMCP] = None):
         self.service = None
         self.credentials = None
-        self.mcp_server = FastMCP("Gmail Email Responder")
+        # Operator filters are applied by Gmail, so excluded mail is never downloaded
+        self.query = f"{UNREAD_QUERY} {config.gmail_query}".strip()
+        self._processed_label_id: Optional[str] = None
+        self._executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="gmail")
+        self._thread_local = threading.local()
+        self.mcp_server = mcp_server or shared_mcp_server
         self._setup_gmail_service()
         self._setup_mcp_tools()
     
     def _setup_gmail_service(self) -> None:
         """Setup Gmail API service."""
         try:
-            creds = None
-            
-            # Load existing token
-            if os.path.exists(config.gmail_token_path):
-                creds = Credentials.from_authorized_user_file(config.gmail_token_path, SCOPES)
-            
-            # If there are no (valid) credentials available, let the user log in
-            if not creds or not creds.valid:
-                if creds and creds.expired and creds.refresh_token:
-                    creds.refresh(Request())
-                else:
-                    if os.path.exists(config.gmail_credentials_path):
-                        flow = InstalledAppFlow.from_client_secrets_file(
-                            config.gmail_credentials_path, SCOPES
-                        )
-                        creds = flow.run_local_server(port=0)
-                    else:
-                        logger.error(f"Gmail credentials file not found: {config.gmail_credentials_path}")
-                        return
-                
-                # Save the credentials for the next run
-                with open(config.gmail_token_path, 'w') as token:
-                    token.write(creds.to_json())
-            
-            self.credentials = creds
-            self.service = build('gmail', 'v1', credentials=creds)
-            logger.info("Gmail service initialized successfully")
-            
+            self.credentials = gmail_auth.get_credentials()
+            self.service = gmail_auth.get_service()
         except Exception as e:
-            logger.error(f"Failed to setup Gmail service: {e}")
+            logger.error("Failed to setup Gmail service: %s", e)
             self.service = None
     
     def _setup_mcp_tools(self) -> None:
@@ -112,6 +123,11 @@ class GmailFetcher:
             """Mark an email as processed by adding a label."""
             return self.mark_as_processed(email_id)
         
+        @self.mcp_server.tool()
+        def mark_emails_processed(email_ids: List[str]) -> bool:
+            """Mark several emails as processed in one request."""
+            return self.mark_many_as_processed(email_ids)
+        
         @self.mcp_server.tool()
         def get_email_content(email_id: str) -> Optional[Dict[str, Any]]:
             """Get full email content by ID."""
@@ -119,67 +135,221 @@ class GmailFetcher:
             return email.to_dict() if email else None
     
     def _extract_email_body(self, payload: Dict[str, Any]) -> str:
-        """Extract email body from Gmail API payload."""
-        body = ""
-        
-        if 'parts' in payload:
-            for part in payload['parts']:
-                if part['mimeType'] == 'text/plain':
-                    if 'data' in part['body']:
-                        import base64
-                        body = base64.urlsafe_b64decode(part['body']['data']).decode('utf-8')
-                        break
-                elif part['mimeType'] == 'multipart/alternative':
-                    body = self._extract_email_body(part)
-                    if body:
-                        break
-        elif payload['mimeType'] == 'text/plain':
-            if 'data' in payload['body']:
-                import base64
-                body = base64.urlsafe_b64decode(payload['body']['data']).decode('utf-8')
-        
-        return body.strip()
+        """Extract email body from Gmail API payload.
+        
+        Walks the MIME tree iteratively and returns the first text/plain part,
+        falling back to the first text/html part with tags stripped.
+        """
+        html_data = None
+        stack = deque([payload])
+        
+        while stack:
+            part = stack.pop()
+            mime_type = part.get('mimeType')
+            data = part.get('body', {}).get('data')
+            
+            if data and mime_type == 'text/plain':
+                return self._decode_body(data)
+            if data and mime_type == 'text/html' and html_data is None:
+                html_data = data
+            
+            # Reversed so parts are visited in document order
+            stack.extend(reversed(part.get('parts', ())))
+        
+        if html_data:
+            text = _HTML_TAG_RE.sub(' ', self._decode_body(html_data))
+            return html.unescape(_WHITESPACE_RE.sub(' ', text)).strip()
+        return ""
+    
+    @staticmethod
+    def _decode_body(data: str) -> str:
+        """Decode a base64url-encoded message body."""
+        return pybase64.urlsafe_b64decode(data).decode('utf-8', errors='replace').strip()
     
     def _extract_headers(self, headers: List[Dict[str, str]]) -> Dict[str, str]:
         """Extract relevant headers from email."""
-        header_dict = {}
-        for header in headers:
-            name = header.get('name', '').lower()
-            value = header.get('value', '')
-            if name in ['subject', 'from', 'date', 'to']:
-                header_dict[name] = value
-        return header_dict
+        return {
+            name: header.get('value', '')
+            for header in headers
+            if (name := header.get('name', '').lower()) in WANTED_HEADERS
+        }
     
     def fetch_unread_emails(self, max_results: Optional[int] = None) -> List[EmailData]:
-        """Fetch unread emails from Gmail."""
+        """Fetch unread emails from Gmail.
+        
+        Messages are fetched through Gmail batch requests, so a batch of up to
+        100 emails costs a single extra HTTP round trip.
+        """
         if not self.service:
             logger.error("Gmail service not initialized")
             return []
         
         max_results = max_results or config.max_emails_per_batch
-        emails = []
+        self._refresh_credentials()
         
         try:
             # Query for unread emails
-            query = 'is:unread -label:auto-responder-processed'
             results = self.service.users().messages().list(
                 userId='me',
-                q=query,
+                q=self.query,
                 maxResults=max_results
             ).execute()
             
             messages = results.get('messages', [])
-            logger.info(f"Found {len(messages)} unread emails")
+            logger.info("Found %s unread emails", len(messages))
             
-            for message in messages:
-                email_data = self.get_email_by_id(message['id'])
-                if email_data:
-                    emails.append(email_data)
+            return self.get_emails_by_ids([message['id'] for message in messages])
             
         except HttpError as error:
-            logger.error(f"An error occurred fetching emails: {error}")
+            logger.error("An error occurred fetching emails: %s", error)
+            return []
+    
+    def get_emails_by_ids(self, email_ids: List[str]) -> List[EmailData]:
+        """Get several emails using Gmail batch requests.
         
-        return emails
+        Returns the emails that were fetched successfully, in request order.
+        """
+        if not self.service or not email_ids:
+            return []
+        
+        fetched: Dict[str, EmailData] = {}
+        
+        def on_response(request_id: str, response: Dict[str, Any], exception: Optional[Exception]) -> None:
+            if exception is not None:
+                logger.error("An error occurred getting email %s: %s", request_id, exception)
+                return
+            fetched[request_id] = self._parse_message(response)
+        
+        for start in range(0, len(email_ids), GMAIL_BATCH_LIMIT):
+            batch = self.service.new_batch_http_request(callback=on_response)
+            for email_id in email_ids[start:start + GMAIL_BATCH_LIMIT]:
+                batch.add(self._message_request(email_id), request_id=email_id)
+            batch.execute()
+        
+        return [fetched[email_id] for email_id in email_ids if email_id in fetched]
+    
+    def _message_request(self, email_id: str) -> Any:
+        """Build a messages.get request for the full message."""
+        return self.service.users().messages().get(userId='me', id=email_id, format='full')
+    
+    async def fetch_unread_emails_async(
+        self,
+        max_results: Optional[int] = None,
+        include_body: bool = True
+    ) -> List[EmailData]:
+        """Fetch unread emails, issuing the per-message GETs concurrently.
+        
+        With ``include_body=False`` only headers are transferred and bodies
+        are left empty; load them later with ``fetch_email_bodies_async``.
+        """
+        if not self.credentials:
+            logger.error("Gmail service not initialized")
+            return []
+        
+        max_results = max_results or config.max_emails_per_batch
+        await gmail_auth.aensure_fresh_credentials(self.credentials)
+        
+        try:
+            async with self._async_client() as client:
+                message_ids = await self._list_message_ids_async(
+                    client,
+                    {'q': self.query, 'maxResults': max_results}
+                )
+                logger.info("Found %s unread emails", len(message_ids))
+                
+                results = await self._get_emails_async(
+                    client,
+                    message_ids,
+                    include_body,
+                    asyncio.Semaphore(config.gmail_fetch_concurrency)
+                )
+        except httpx.HTTPError as error:
+            logger.error("An error occurred fetching emails: %s", error)
+            return []
+        
+        return [email_data for email_data in results if email_data]
+    
+    async def fetch_email_bodies_async(self, email_ids: List[str]) -> Dict[str, str]:
+        """Load the bodies of emails that were fetched with headers only.
+        
+        Returns:
+            Body of each email that could be fetched, by message id
+        """
+        if not self.credentials or not email_ids:
+            return {}
+        
+        await gmail_auth.aensure_fresh_credentials(self.credentials)
+        try:
+            async with self._async_client() as client:
+                results = await self._get_emails_async(
+                    client,
+                    email_ids,
+                    True,
+                    asyncio.Semaphore(config.gmail_fetch_concurrency)
+                )
+        except httpx.HTTPError as error:
+            logger.error("An error occurred fetching email bodies: %s", error)
+            return {}
+        
+        return {email_data.id: email_data.body for email_data in results if email_data}
+    
+    def _async_client(self) -> httpx.AsyncClient:
+        """Create an async client authorized for the Gmail API."""
+        return gmail_auth.async_client(
+            self.credentials,
+            base_url=GMAIL_API_URL,
+            limits=httpx.Limits(max_connections=20)
+        )
+    
+    @staticmethod
+    async def _list_message_ids_async(client: httpx.AsyncClient, params: Dict[str, Any]) -> List[str]:
+        """List the ids of the first page of matching messages.
+        
+        Later pages are not followed: claiming removes emails from the unread
+        query, so page tokens would skip messages. The next run's fresh query
+        picks up the rest.
+        """
+        response = await client.get('/messages', params=params)
+        response.raise_for_status()
+        return [message['id'] for message in response.json().get('messages', [])]
+    
+    async def _get_emails_async(
+        self,
+        client: httpx.AsyncClient,
+        email_ids: List[str],
+        include_body: bool,
+        semaphore: asyncio.Semaphore
+    ) -> List[Optional[EmailData]]:
+        """Fetch several emails concurrently, bounded to respect Gmail rate limits."""
+        async def fetch_one(email_id: str) -> Optional[EmailData]:
+            async with semaphore:
+                return await self._get_email_async(client, email_id, include_body)
+        
+        return await asyncio.gather(*(fetch_one(email_id) for email_id in email_ids))
+    
+    async def _get_email_async(
+        self,
+        client: httpx.AsyncClient,
+        email_id: str,
+        include_body: bool = True
+    ) -> Optional[EmailData]:
+        """Get email details by ID using the async client."""
+        if include_body:
+            params = {'format': 'full'}
+        else:
+            params = {'format': 'metadata', 'metadataHeaders': METADATA_HEADERS}
+        
+        try:
+            response = await client.get(f'/messages/{email_id}', params=params)
+            response.raise_for_status()
+            return self._parse_message(response.json(), include_body)
+        except httpx.HTTPError as error:
+            logger.error("An error occurred getting email %s: %s", email_id, error)
+            return None
+    
+    def _refresh_credentials(self) -> None:
+        """Refresh the OAuth access token if it expires soon."""
+        gmail_auth.ensure_fresh_credentials(self.credentials)
     
     def get_email_by_id(self, email_id: str) -> Optional[EmailData]:
         """Get email details by ID."""
@@ -187,81 +357,121 @@ class GmailFetcher:
             return None
         
         try:
-            message = self.service.users().messages().get(
-                userId='me',
-                id=email_id,
-                format='full'
-            ).execute()
-            
-            headers = self._extract_headers(message['payload'].get('headers', []))
-            body = self._extract_email_body(message['payload'])
-            
-            # Parse sender
-            from_header = headers.get('from', '')
-            sender_email = ''
-            sender_name = from_header
-            
-            if '<' in from_header and '>' in from_header:
-                sender_name = from_header.split('<')[0].strip().strip('"')
-                sender_email = from_header.split('<')[1].split('>')[0].strip()
-            else:
-                sender_email = from_header
-            
-            # Parse timestamp
-            timestamp = datetime.now()
-            if 'date' in headers:
-                try:
-                    from email.utils import parsedate_to_datetime
-                    timestamp = parsedate_to_datetime(headers['date'])
-                except Exception:
-                    pass
-            
-            email_data = EmailData(
-                id=email_id,
-                subject=headers.get('subject', ''),
-                sender=sender_name,
-                sender_email=sender_email,
-                body=body,
-                timestamp=timestamp,
-                thread_id=message.get('threadId', ''),
-                labels=message.get('labelIds', [])
-            )
-            
-            return email_data
+            message = self._message_request(email_id).execute()
+            return self._parse_message(message)
             
         except HttpError as error:
-            logger.error(f"An error occurred getting email {email_id}: {error}")
+            logger.error("An error occurred getting email %s: %s", email_id, error)
             return None
     
+    def _parse_message(self, message: Dict[str, Any], include_body: bool = True) -> EmailData:
+        """Build EmailData from a Gmail API message resource."""
+        headers = self._extract_headers(message['payload'].get('headers', []))
+        body = self._extract_email_body(message['payload']) if include_body else ""
+        
+        # Parse sender
+        sender_name, sender_email = self._parse_sender(headers.get('from', ''))
+        
+        # Parse timestamp
+        timestamp = datetime.now()
+        if 'date' in headers:
+            try:
+                timestamp = parsedate_to_datetime(headers['date'])
+            except Exception:
+                pass
+        
+        return EmailData(
+            id=message['id'],
+            subject=headers.get('subject', ''),
+            sender=sender_name,
+            sender_email=sender_email,
+            body=body,
+            timestamp=timestamp,
+            thread_id=message.get('threadId', ''),
+            labels=tuple(message.get('labelIds', ())),
+            # A single-part text/plain message suggests a plain-text correspondent
+            prefers_plain_text=message['payload'].get('mimeType') == 'text/plain',
+            is_automated=self._is_automated(headers)
+        )
+    
+    @staticmethod
+    def _is_automated(headers: Dict[str, str]) -> bool:
+        """Check the headers autoresponders and bulk senders set (RFC 3834)."""
+        auto_submitted = (headers.get('auto-submitted') or 'no').strip().lower()
+        return (
+            auto_submitted != 'no'
+            or 'x-autoreply' in headers
+            or headers.get('precedence', '').strip().lower() in BULK_PRECEDENCE
+        )
+    
+    @staticmethod
+    def _parse_sender(from_header: str) -> Tuple[str, str]:
+        """Split a From header into a decoded display name and address."""
+        name, address = parseaddr(from_header)
+        if not name:
+            return address or from_header, address
+        try:
+            name = str(make_header(decode_header(name)))
+        except Exception:
+            pass
+        return name, address
+    
+    def _get_processed_label_id(self) -> str:
+        """Get the id of the processed label, creating it if needed.
+        
+        The id is looked up once and cached for the lifetime of the fetcher.
+        """
+        if self._processed_label_id:
+            return self._processed_label_id
+        
+        labels_result = self.service.users().labels().list(userId='me').execute()
+        for label in labels_result.get('labels', []):
+            if label['name'] == PROCESSED_LABEL:
+                self._processed_label_id = label['id']
+                return self._processed_label_id
+        
+        # Create the label
+        label_object = {
+            'name': PROCESSED_LABEL,
+            'labelListVisibility': 'labelShow',
+            'messageListVisibility': 'show'
+        }
+        created_label = self.service.users().labels().create(
+            userId='me',
+            body=label_object
+        ).execute()
+        self._processed_label_id = created_label['id']
+        return self._processed_label_id
+    
+    async def _aget_processed_label_id(self) -> str:
+        """Async version of ``_get_processed_label_id`` using per-thread transports."""
+        if self._processed_label_id:
+            return self._processed_label_id
+        
+        labels_result = await self._aexec(self.service.users().labels().list(userId='me'))
+        for label in labels_result.get('labels', []):
+            if label['name'] == PROCESSED_LABEL:
+                self._processed_label_id = label['id']
+                return self._processed_label_id
+        
+        created_label = await self._aexec(self.service.users().labels().create(
+            userId='me',
+            body={
+                'name': PROCESSED_LABEL,
+                'labelListVisibility': 'labelShow',
+                'messageListVisibility': 'show'
+            }
+        ))
+        self._processed_label_id = created_label['id']
+        return self._processed_label_id
+    
     def mark_as_processed(self, email_id: str) -> bool:
         """Mark email as processed by adding a label."""
         if not self.service:
             return False
         
         try:
-            # Create custom label if it doesn't exist
-            label_name = 'auto-responder-processed'
-            labels_result = self.service.users().labels().list(userId='me').execute()
-            labels = labels_result.get('labels', [])
-            
-            label_id = None
-            for label in labels:
-                if label['name'] == label_name:
-                    label_id = label['id']
-                    break
-            
-            if not label_id:
-                # Create the label
-                label_object = {
-                    'name': label_name,
-                    'labelListVisibility': 'labelShow',
-                    'messageListVisibility': 'show'
-                }
-                created_label = self.service.users().labels().create(
-                    userId='me',
-                    body=label_object
-                ).execute()
-                label_id = created_label['id']
+            label_id = self._get_processed_label_id()
             
             # Add label to message
             self.service.users().messages().modify(
@@ -270,17 +480,129 @@ class GmailFetcher:
                 body={'addLabelIds': [label_id]}
             ).execute()
             
-            logger.debug(f"Marked email {email_id} as processed")
+            logger.debug("Marked email %s as processed", email_id)
+            return True
+            
+        except HttpError as error:
+            logger.error("An error occurred marking email as processed: %s", error)
+            return False
+    
+    def mark_many_as_processed(self, email_ids: List[str]) -> bool:
+        """Mark several emails as processed with a single batchModify call."""
+        if not self.service:
+            return False
+        if not email_ids:
+            return True
+        
+        try:
+            label_id = self._get_processed_label_id()
+            
+            for start in range(0, len(email_ids), GMAIL_BATCH_MODIFY_LIMIT):
+                self.service.users().messages().batchModify(
+                    userId='me',
+                    body={
+                        'ids': email_ids[start:start + GMAIL_BATCH_MODIFY_LIMIT],
+                        'addLabelIds': [label_id]
+                    }
+                ).execute()
+            
+            logger.debug("Marked %s emails as processed", len(email_ids))
             return True
             
         except HttpError as error:
-            logger.error(f"An error occurred marking email as processed: {error}")
+            logger.error("An error occurred marking emails as processed: %s", error)
             return False
     
     def get_mcp_server(self) -> FastMCP:
         """Get the MCP server instance."""
         return self.mcp_server
 
+    def _thread_http(self) -> AuthorizedHttp:
+        """Get an authorized HTTP transport owned by the current thread.
+        
+        httplib2 is not thread-safe, so each executor thread gets its own.
+        """
+        http = getattr(self._thread_local, 'http', None)
+        if http is None:
+            http = AuthorizedHttp(self.credentials, http=build_http())
+            self._thread_local.http = http
+        return http
+    
+    async def _aexec(self, request: Any) -> Any:
+        """Execute a googleapiclient request in the thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            lambda: request.execute(http=self._thread_http())
+        )
+    
+    async def claim_emails_async(self, email_ids: List[str]) -> List[str]:
+        """Mark emails as read and processed in one batchModify call.
+        
+        Done right after fetching, so the messages are claimed before any
+        slow work and a concurrent run cannot pick them up again.
+        
+        Returns:
+            Ids that were claimed; only these may be answered
+        """
+        return await self._batch_modify_async(email_ids, add_processed=True, remove_label_ids=['UNREAD'])
+    
+    async def release_emails_async(self, email_ids: List[str]) -> bool:
+        """Undo ``claim_emails_async`` for emails that could not be answered."""
+        released = await self._batch_modify_async(email_ids, remove_processed=True, add_label_ids=['UNREAD'])
+        return len(released) == len(email_ids)
+    
+    async def _batch_modify_async(
+        self,
+        email_ids: List[str],
+        add_processed: bool = False,
+        remove_processed: bool = False,
+        add_label_ids: Optional[List[str]] = None,
+        remove_label_ids: Optional[List[str]] = None
+    ) -> List[str]:
+        """Change labels of several emails with as few batchModify calls as possible.
+        
+        Each batchModify call applies to its chunk as a whole, so a failed
+        chunk leaves its emails untouched while the others may succeed.
+        
+        Returns:
+            Ids whose labels were changed
+        """
+        if not self.service or not email_ids:
+            return []
+        
+        try:
+            add_label_ids = list(add_label_ids or [])
+            remove_label_ids = list(remove_label_ids or [])
+            if add_processed or remove_processed:
+                label_id = await self._aget_processed_label_id()
+                (add_label_ids if add_processed else remove_label_ids).append(label_id)
+        except Exception as e:
+            logger.error("Failed to resolve the processed label: %s", e)
+            return []
+        
+        chunks = [
+            email_ids[start:start + GMAIL_BATCH_MODIFY_LIMIT]
+            for start in range(0, len(email_ids), GMAIL_BATCH_MODIFY_LIMIT)
+        ]
+        outcomes = await asyncio.gather(*(
+            self._aexec(self.service.users().messages().batchModify(
+                userId='me',
+                body={'ids': chunk, 'addLabelIds': add_label_ids, 'removeLabelIds': remove_label_ids}
+            ))
+            for chunk in chunks
+        ), return_exceptions=True)
+        
+        updated = []
+        for chunk, outcome in zip(chunks, outcomes):
+            if isinstance(outcome, Exception):
+                logger.error("An error occurred updating labels of %s emails: %s", len(chunk), outcome)
+            else:
+                updated.extend(chunk)
+        
+        logger.debug("Updated labels of %s emails", len(updated))
+        return updated
+    
     def test_connection(self) -> bool:
         """Test Gmail API connection."""
         if not self.service:
@@ -290,18 +612,36 @@ class GmailFetcher:
         try:
             # Try to get user profile to test connection
             profile = self.service.users().getProfile(userId='me').execute()
-            email_address = profile.get('emailAddress', '')
-            logger.info(f"Gmail connection test successful - Email: {email_address}")
-            
-            # Verify it matches configured email
-            if config.gmail_email_address and email_address != config.gmail_email_address:
-                logger.warning(f"Connected email ({email_address}) differs from configured email ({config.gmail_email_address})")
+            return self._check_profile(profile)
             
-            return True
+        except Exception as e:
+            logger.error("Gmail connection test failed: %s", e)
+            return False
+    
+    async def atest_connection(self) -> bool:
+        """Test Gmail API connection without blocking the event loop."""
+        if not self.service:
+            logger.error("Gmail service not initialized")
+            return False
+        
+        try:
+            profile = await self._aexec(self.service.users().getProfile(userId='me'))
+            return self._check_profile(profile)
             
         except Exception as e:
-            logger.error(f"Gmail connection test failed: {e}")
+            logger.error("Gmail connection test failed: %s", e)
             return False
+    
+    def _check_profile(self, profile: Dict[str, Any]) -> bool:
+        """Log the connected account and check it matches the configuration."""
+        email_address = profile.get('emailAddress', '')
+        logger.info("Gmail connection test successful - Email: %s", email_address)
+        
+        # Verify it matches configured email
+        if config.gmail_email_address and email_address != config.gmail_email_address:
+            logger.warning("Connected email (%s) differs from configured email (%s)", email_address, config.gmail_email_address)
+        
+        return True
 
 
 # Global Gmail fetcher instance
@@ -0,0 +1,52 @@
+"""Shared Gemini chat client."""
+
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+# Sampling settings for customer-facing responses
+RESPONSE_GENERATION_CONFIG: Dict[str, Any] = {
+    "temperature": 0.3,
+    "max_output_tokens": config.max_response_length,
+    "top_p": 0.8,
+    "top_k": 40,
+}
+
+# Near-deterministic settings for intent classification and query generation
+CLASSIFIER_GENERATION_CONFIG: Dict[str, Any] = {
+    "temperature": 0.1,
+}
+
+_lock = threading.Lock()
+_llm: Optional[ChatGoogleGenerativeAI] = None
+
+
+def get_llm() -> Optional[ChatGoogleGenerativeAI]:
+    """Get the process-wide Gemini client, creating it on first use.
+    
+    Components share its connection pool and bind their own sampling
+    settings with ``with_generation_config``.
+    """
+    global _llm
+    with _lock:
+        if _llm is None and config.google_api_key:
+            _llm = ChatGoogleGenerativeAI(
+                model=config.gemini_model,
+                google_api_key=config.google_api_key
+            )
+            logger.info("Initialized Gemini model: %s", config.gemini_model)
+        return _llm
+
+
+def with_generation_config(generation_config: Dict[str, Any]) -> Optional[Any]:
+    """Get the shared client bound to per-call generation settings."""
+    llm = get_llm()
+    if llm is None:
+        return None
+    return llm.bind(generation_config=generation_config)
@@ -1,18 +1,77 @@
 """LLM response chain using Gemini for email response generation."""
 
+import asyncio
 import logging
-from typing import List, Dict, Any, Optional
-from langchain_google_genai import ChatGoogleGenerativeAI
+import re
+import threading
+from typing import List, Dict, Any, AsyncIterator, Iterator, Optional, Tuple
+from cachetools import LRUCache
 from langchain.schema import Document, HumanMessage, SystemMessage
 from langchain.prompts import ChatPromptTemplate, PromptTemplate
-from langchain.schema.runnable import RunnablePassthrough
-from langchain.schema.output_parser import BaseOutputParser
+from langchain.schema.runnable import RunnableLambda, RunnablePassthrough
+from langchain.schema.output_parser import BaseOutputParser, StrOutputParser
 
+from . import batch
 from .config import config
-from .cache_manager import cache_manager
+from .cache_manager import cache_manager, content_key
+from .concurrency import CircuitOpenError, llm_guard
+from .llm_client import RESPONSE_GENERATION_CONFIG, with_generation_config
 
 logger = logging.getLogger(__name__)
 
+# Lines that look like bracketed instructions or role labels
+_DROP_LINE_RE = re.compile(r"^\[.*\]$|assistant:|system:", re.IGNORECASE)
+
+# Static instructions; must not contain any per-request placeholders
+SYSTEM_PROMPT = """You are a helpful customer service AI assistant. Your job is to generate professional and helpful email responses based on the customer's inquiry and relevant company policies.
+
+Guidelines:
+1. Use the tone requested with each email and stay professional
+2. Address the customer's specific question or concern
+3. Use the provided policy information to give accurate answers
+4. Keep responses concise but complete
+5. If you cannot find relevant information, politely direct them to human support
+6. Do not make up information not contained in the policies
+7. Always end with a professional closing"""
+
+# Per-intent guidance appended to the system prompt; intents match IntentClassifier.INTENTS
+INTENT_GUIDANCE = {
+    "billing": "The customer has a billing question. Quote amounts, dates and refund terms only as stated in the policies.",
+    "technical_support": "The customer reports a technical problem. Give concrete troubleshooting steps from the policies before suggesting escalation.",
+    "feature_request": "The customer is suggesting a feature. Thank them, explain how feature requests are reviewed, and make no promises about delivery.",
+    "general": "The customer has a general inquiry. Answer directly and point to the relevant contact details or resources.",
+}
+
+HUMAN_PROMPT = """Policy Information:
+{context}
+
+Customer Email:
+Subject: {email_subject}
+From: {sender_name}
+Content: {email_body}
+
+Tone: {tone}
+
+Please generate a professional email response:"""
+
+
+def system_prompt(intent: Optional[str]) -> str:
+    """Get the system prompt for an intent, falling back to ``general``."""
+    guidance = INTENT_GUIDANCE.get(intent or "general", INTENT_GUIDANCE["general"])
+    return f"{SYSTEM_PROMPT}\n\n{guidance}"
+
+
+# One template per intent, built once. Each system message is static, so all
+# emails of an intent share a byte-identical prefix for Gemini's implicit
+# prompt caching; everything that varies per email is in the human message.
+PROMPT_TEMPLATES: Dict[str, ChatPromptTemplate] = {
+    intent: ChatPromptTemplate.from_messages([
+        ("system", system_prompt(intent)),
+        ("human", HUMAN_PROMPT)
+    ])
+    for intent in INTENT_GUIDANCE
+}
+
 
 class EmailResponseParser(BaseOutputParser):
     """Custom parser for email responses."""
@@ -20,18 +79,9 @@ class EmailResponseParser(BaseOutputParser):
     def parse(self, text: str) -> str:
         """Parse the LLM response to extract clean email content."""
         # Remove any system messages or instructions
-        lines = text.strip().split('\n')
-        clean_lines = []
-        
-        for line in lines:
-            # Skip lines that look like instructions
-            if line.startswith('[') and line.endswith(']'):
-                continue
-            if 'assistant:' in line.lower() or 'system:' in line.lower():
-                continue
-            clean_lines.append(line)
-        
-        response = '\n'.join(clean_lines).strip()
+        response = '\n'.join(
+            line for line in text.strip().split('\n') if not _DROP_LINE_RE.search(line)
+        ).strip()
         
         # Limit response length
         if len(response) > config.max_response_length:
@@ -45,9 +95,12 @@ class LLMResponseChain:
     
     def __init__(self):
         self.llm = None
-        self.prompt_template = None
+        self.prompt_templates: Dict[str, ChatPromptTemplate] = {}
         self.chain = None
+        self.text_chain = None
         self.parser = EmailResponseParser()
+        self._context_cache: LRUCache = LRUCache(maxsize=512)
+        self._context_lock = threading.Lock()
         self._setup_llm()
         self._setup_prompt()
         self._setup_chain()
@@ -59,78 +112,64 @@ class LLMResponseChain:
                 logger.error("Google API key not configured")
                 return
             
-            self.llm = ChatGoogleGenerativeAI(
-                model=config.gemini_model,
-                google_api_key=config.google_api_key,
-                temperature=0.3,
-                max_tokens=config.max_response_length,
-                top_p=0.8,
-                top_k=40
-            )
-            
-            logger.info(f"Initialized Gemini model: {config.gemini_model}")
+            # Shared client with response sampling settings bound per call
+            self.llm = with_generation_config(RESPONSE_GENERATION_CONFIG)
             
         except Exception as e:
-            logger.error(f"Failed to setup LLM: {e}")
+            logger.error("Failed to setup LLM: %s", e)
     
     def _setup_prompt(self) -> None:
-        """Setup prompt template for email responses."""
-        
-        system_prompt = """You are a helpful customer service AI assistant. Your job is to generate professional, {tone}, and helpful email responses based on the customer's inquiry and relevant company policies.
-
-Guidelines:
-1. Be {tone} and professional in tone
-2. Address the customer's specific question or concern
-3. Use the provided policy information to give accurate answers
-4. Keep responses concise but complete
-5. If you cannot find relevant information, politely direct them to human support
-6. Do not make up information not contained in the policies
-7. Always end with a professional closing
-
-Policy Information:
-{context}
-
-Customer Email:
-Subject: {email_subject}
-From: {sender_name}
-Content: {email_body}
-
-Please generate a professional email response:"""
-
-        self.prompt_template = ChatPromptTemplate.from_messages([
-            ("system", system_prompt),
-            ("human", "Generate an appropriate response to this customer email.")
-        ])
+        """Setup the per-intent prompt templates for email responses."""
+        self.prompt_templates = PROMPT_TEMPLATES
     
     def _setup_chain(self) -> None:
         """Setup the LangChain response chain."""
-        if not self.llm or not self.prompt_template:
+        if not self.llm or not self.prompt_templates:
             logger.error("Cannot setup chain: LLM or prompt not initialized")
             return
         
         try:
-            self.chain = (
+            # Raw text chain, streamed by the sync path; the parser needs the full text
+            self.text_chain = (
                 RunnablePassthrough.assign(
                     context=lambda x: self._format_context(x.get("context", [])),
                     tone=lambda x: config.response_tone
                 )
-                | self.prompt_template
+                | RunnableLambda(self._select_prompt)
                 | self.llm
-                | self.parser
+                | StrOutputParser()
             )
+            self.chain = self.text_chain | self.parser
             
             logger.info("Response chain setup complete")
             
         except Exception as e:
-            logger.error(f"Failed to setup response chain: {e}")
+            logger.error("Failed to setup response chain: %s", e)
     
     def _format_context(self, documents: List[Document]) -> str:
-        """Format retrieved documents as context."""
+        """Format retrieved documents as context.
+        
+        Popular intents keep retrieving the same top policies, so formatted
+        context is memoized by document source and content.
+        """
         if not documents:
             return "No specific policy information available for this query."
         
+        documents = documents[:5]  # Limit to top 5 documents
+        key = tuple(content_key(doc.metadata.get('source') or '', doc.page_content) for doc in documents)
+        with self._context_lock:
+            context = self._context_cache.get(key)
+        if context is None:
+            context = self._build_context(documents)
+            with self._context_lock:
+                self._context_cache[key] = context
+        return context
+    
+    @staticmethod
+    def _build_context(documents: List[Document]) -> str:
+        """Join documents under per-policy headings."""
         context_parts = []
-        for i, doc in enumerate(documents[:5], 1):  # Limit to top 5 documents
+        for i, doc in enumerate(documents, 1):
             # Extract filename from metadata if available
             source = doc.metadata.get('source', f'Document {i}')
             if source:
@@ -141,21 +180,76 @@ Please generate a professional email response:"""
         
         return "\n\n".join(context_parts)
     
-    def _create_cache_key(self, email_subject: str, email_body: str, context_docs: List[Document]) -> str:
+    def _create_cache_key(
+        self,
+        email_subject: str,
+        email_body: str,
+        sender_name: str,
+        context_docs: List[Document],
+        intent: Optional[str]
+    ) -> str:
         """Create cache key for response."""
-        # Create a hash based on email content and context
-        content = f"{email_subject}|{email_body}"
-        if context_docs:
-            context_content = "|".join([doc.page_content[:100] for doc in context_docs[:3]])
-            content += f"|{context_content}"
-        return content
+        # Fixed-size digest of the email content and everything else the reply depends on
+        return content_key(email_subject, email_body, self._cache_scope(sender_name, context_docs, intent))
+    
+    @staticmethod
+    def _cache_scope(sender_name: str, context_docs: List[Document], intent: Optional[str]) -> str:
+        """Digest of what a cached reply depends on besides the email text.
+        
+        Replies greet the sender by name and quote the retrieved policies, so
+        a semantic cache hit is only valid for the same sender, intent and
+        policy context.
+        """
+        return content_key(sender_name, intent or "general", *(doc.page_content for doc in context_docs))
+    
+    def _embed_for_cache(self, email_subject: str, email_body: str) -> Optional[List[float]]:
+        """Embed the email for the semantic cache using the policy embedding model."""
+        if not config.semantic_cache_enabled:
+            return None
+        
+        # Imported lazily; the retriever loads the embedding model on import
+        from .retriever_chain import email_query, policy_retriever
+        if not policy_retriever.embeddings:
+            return None
+        
+        try:
+            return policy_retriever.embeddings.embed_query(email_query(email_subject, email_body))
+        except Exception as e:
+            logger.warning("Failed to embed email for semantic cache: %s", e)
+            return None
+    
+    def _lookup_cache(
+        self,
+        cache_key: str,
+        scope: str,
+        email_subject: str,
+        email_body: str
+    ) -> Tuple[Optional[str], Optional[List[float]]]:
+        """Look up a cached response, returning it with the email's embedding.
+        
+        The exact key is checked first so exact hits never pay for an
+        embedding; the email is only embedded for the semantic fallback.
+        """
+        cached_response = cache_manager.get_prompt_response(cache_key)
+        if cached_response:
+            return cached_response, None
+        
+        embedding = self._embed_for_cache(email_subject, email_body)
+        if embedding is None:
+            return None, None
+        return cache_manager.get_similar_response(embedding, scope), embedding
+    
+    def _select_prompt(self, input_data: Dict[str, Any]) -> ChatPromptTemplate:
+        """Route to the prompt template of the email's intent; LangChain invokes it with the input."""
+        return self.prompt_templates.get(input_data.get("intent") or "general", self.prompt_templates["general"])
     
     def generate_response(
         self,
         email_subject: str,
         email_body: str,
         sender_name: str,
-        context_documents: List[Document]
+        context_documents: List[Document],
+        intent: Optional[str] = None
     ) -> Optional[str]:
         """Generate email response using the LLM chain."""
         
@@ -163,39 +257,246 @@ Please generate a professional email response:"""
             logger.error("Response chain not initialized")
             return None
         
-        # Check cache first
-        cache_key = self._create_cache_key(email_subject, email_body, context_documents)
-        cached_response = cache_manager.get_prompt_response(cache_key)
+        # Check cache first (exact key, then semantically similar emails)
+        cache_key = self._create_cache_key(email_subject, email_body, sender_name, context_documents, intent)
+        scope = self._cache_scope(sender_name, context_documents, intent)
+        cached_response, embedding = self._lookup_cache(cache_key, scope, email_subject, email_body)
         if cached_response:
             logger.debug("Retrieved response from cache")
             return cached_response
         
         try:
-            # Prepare input data
-            input_data = {
-                "email_subject": email_subject,
-                "email_body": email_body,
-                "sender_name": sender_name,
-                "context": context_documents
-            }
+            # Generate response, stopping the stream once the length cap is reached
+            text = llm_guard.call(lambda: "".join(self._stream_text(
+                self._input_data(email_subject, email_body, sender_name, context_documents, intent)
+            )))
+            return self._accept_response(self.parser.parse(text), cache_key, embedding, scope, sender_name)
             
-            # Generate response
-            response = self.chain.invoke(input_data)
+        except Exception as e:
+            logger.error("Error generating response: %s", e)
+            return self._generate_fallback_response(sender_name)
+    
+    def generate_response_stream(
+        self,
+        email_subject: str,
+        email_body: str,
+        sender_name: str,
+        context_documents: List[Document],
+        intent: Optional[str] = None
+    ) -> Iterator[str]:
+        """Generate an email response, yielding raw text chunks as they arrive.
+        
+        The stream is cut off once ``config.max_response_length`` characters
+        have been produced. The complete response is parsed and cached as in
+        ``generate_response``; cached and fallback responses are yielded whole.
+        """
+        if not self.chain:
+            logger.error("Response chain not initialized")
+            return
+        
+        cache_key = self._create_cache_key(email_subject, email_body, sender_name, context_documents, intent)
+        scope = self._cache_scope(sender_name, context_documents, intent)
+        cached_response, embedding = self._lookup_cache(cache_key, scope, email_subject, email_body)
+        if cached_response:
+            logger.debug("Retrieved response from cache")
+            yield cached_response
+            return
+        
+        chunks = []
+        try:
+            llm_guard.breaker.before_call()
+            llm_guard.limiter.acquire()
+            for chunk in self._stream_text(
+                self._input_data(email_subject, email_body, sender_name, context_documents, intent)
+            ):
+                chunks.append(chunk)
+                yield chunk
+        except Exception as e:
+            if not isinstance(e, CircuitOpenError):
+                llm_guard.breaker.record_failure()
+            logger.error("Error generating response: %s", e)
+            if not chunks:
+                yield self._generate_fallback_response(sender_name)
+            return
+        
+        llm_guard.breaker.record_success()
+        
+        self._accept_response(self.parser.parse("".join(chunks)), cache_key, embedding, scope, sender_name)
+    
+    def _stream_text(self, input_data: Dict[str, Any]) -> Iterator[str]:
+        """Stream raw LLM text, closing the stream once the length cap is exceeded."""
+        stream = self.text_chain.stream(input_data)
+        length = 0
+        try:
+            for chunk in stream:
+                yield chunk
+                length += len(chunk)
+                if length > config.max_response_length:
+                    break
+        finally:
+            stream.close()
+    
+    async def agenerate_response(
+        self,
+        email_subject: str,
+        email_body: str,
+        sender_name: str,
+        context_documents: List[Document],
+        intent: Optional[str] = None
+    ) -> Optional[str]:
+        """Async version of ``generate_response``.
+        
+        Concurrent calls are bounded by ``config.max_concurrent_llm``.
+        """
+        
+        if not self.chain:
+            logger.error("Response chain not initialized")
+            return None
+        
+        cache_key = self._create_cache_key(email_subject, email_body, sender_name, context_documents, intent)
+        scope = self._cache_scope(sender_name, context_documents, intent)
+        # Embedding is CPU-bound; keep it off the event loop
+        cached_response, embedding = await asyncio.to_thread(
+            self._lookup_cache, cache_key, scope, email_subject, email_body
+        )
+        if cached_response:
+            logger.debug("Retrieved response from cache")
+            return cached_response
+        
+        try:
+            # Generate response, stopping the stream once the length cap is reached
+            text = await llm_guard.acall(
+                self._acollect_text,
+                self._input_data(email_subject, email_body, sender_name, context_documents, intent)
+            )
+            return self._accept_response(self.parser.parse(text), cache_key, embedding, scope, sender_name)
             
-            # Validate response
-            if not response or len(response.strip()) < 10:
-                logger.warning("Generated response too short, using fallback")
-                return self._generate_fallback_response(sender_name)
+        except Exception as e:
+            logger.error("Error generating response: %s", e)
+            return self._generate_fallback_response(sender_name)
+    
+    async def _astream_text(self, input_data: Dict[str, Any]) -> AsyncIterator[str]:
+        """Async version of ``_stream_text``."""
+        stream = self.text_chain.astream(input_data)
+        length = 0
+        try:
+            async for chunk in stream:
+                yield chunk
+                length += len(chunk)
+                if length > config.max_response_length:
+                    break
+        finally:
+            await stream.aclose()
+    
+    async def _acollect_text(self, input_data: Dict[str, Any]) -> str:
+        """Collect the capped raw text stream into one string."""
+        return "".join([chunk async for chunk in self._astream_text(input_data)])
+    
+    def generate_responses_batch(self, emails: List[Dict[str, Any]]) -> List[Optional[str]]:
+        """Generate responses for many emails through the Gemini Batch API.
+        
+        Intended for backlog sweeps that are not latency-critical: batch jobs
+        are billed at a discount but may take minutes to complete. Cached
+        responses are served directly and new ones populate the same cache.
+        
+        Args:
+            emails: Dicts with the keyword arguments of ``generate_response``
+        
+        Returns:
+            List[Optional[str]]: Response for each email, in order; None where
+            the batch job failed, timed out or returned no result
+        """
+        if not self.llm:
+            logger.error("LLM not initialized")
+            return [None] * len(emails)
+        
+        responses: List[Optional[str]] = [None] * len(emails)
+        pending = {}
+        requests = []
+        
+        for i, email in enumerate(emails):
+            cache_key = self._create_cache_key(
+                email["email_subject"], email["email_body"], email["sender_name"],
+                email["context_documents"], email.get("intent")
+            )
+            scope = self._cache_scope(email["sender_name"], email["context_documents"], email.get("intent"))
+            cached_response, embedding = self._lookup_cache(
+                cache_key, scope, email["email_subject"], email["email_body"]
+            )
+            if cached_response:
+                responses[i] = cached_response
+                continue
             
-            # Cache the response
-            cache_manager.set_prompt_response(cache_key, response)
+            pending[str(i)] = (i, cache_key, embedding, scope)
+            user_prompt = HUMAN_PROMPT.format(
+                context=self._format_context(email["context_documents"]),
+                email_subject=email["email_subject"],
+                sender_name=email["sender_name"],
+                email_body=email["email_body"],
+                tone=config.response_tone
+            )
+            intent = email.get("intent")
+            requests.append((intent or "general", batch.build_request(
+                str(i), system_prompt(intent), user_prompt, RESPONSE_GENERATION_CONFIG
+            )))
+        
+        if requests:
+            # Submit emails of the same intent together so shared prefixes are adjacent
+            requests = [request for _, request in sorted(requests, key=lambda item: item[0])]
+            results = {}
+            batch_id = batch.submit_batch(requests)
+            job = batch.wait_for_batch(batch_id) if batch_id else None
+            if job:
+                results = batch.fetch_batch_results(job)
             
-            logger.info("Generated email response successfully")
-            return response
+            for key, (i, cache_key, embedding, scope) in pending.items():
+                sender_name = emails[i]["sender_name"]
+                if key in results:
+                    responses[i] = self._accept_response(
+                        self.parser.parse(results[key]), cache_key, embedding, scope, sender_name
+                    )
             
-        except Exception as e:
-            logger.error(f"Error generating response: {e}")
+            missing = len(pending) - len(results.keys() & pending.keys())
+            if missing:
+                logger.warning("No batch result for %s emails", missing)
+        
+        return responses
+    
+    @staticmethod
+    def _input_data(
+        email_subject: str,
+        email_body: str,
+        sender_name: str,
+        context_documents: List[Document],
+        intent: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Prepare input data for the response chain."""
+        return {
+            "email_subject": email_subject,
+            "email_body": email_body,
+            "sender_name": sender_name,
+            "context": context_documents,
+            "intent": intent
+        }
+    
+    def _accept_response(
+        self,
+        response: Optional[str],
+        cache_key: str,
+        embedding: Optional[List[float]],
+        scope: str,
+        sender_name: str
+    ) -> str:
+        """Validate and cache a generated response, falling back if it is unusable."""
+        if not response or len(response.strip()) < 10:
+            logger.warning("Generated response too short, using fallback")
             return self._generate_fallback_response(sender_name)
+        
+        # Cache the response
+        cache_manager.set_prompt_response(cache_key, response, embedding, scope)
+        
+        logger.info("Generated email response successfully")
+        return response
     
     def _generate_fallback_response(self, sender_name: str) -> str:
         """Generate a fallback response when LLM fails."""
@@ -225,9 +526,21 @@ Customer Service Team"""
             response = self.llm.invoke([HumanMessage(content="Hello, please respond with 'OK'")])
             return "OK" in response.content
         except Exception as e:
-            logger.error(f"LLM connection test failed: {e}")
+            logger.error("LLM connection test failed: %s", e)
             return False
 
 
-# Global LLM response chain instance
-llm_response_chain = LLMResponseChain() 
\ No newline at end of file
+# Global LLM response chain instance, created on first access (PEP 562) so that
+# importing this module does not load models or open connections
+_instance: Optional[LLMResponseChain] = None
+_instance_lock = threading.Lock()
+
+
+def __getattr__(name: str) -> Any:
+    global _instance
+    if name == "llm_response_chain":
+        with _instance_lock:
+            if _instance is None:
+                _instance = LLMResponseChain()
+        return _instance
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
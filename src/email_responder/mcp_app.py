@@ -0,0 +1,6 @@
+"""Shared FastMCP server exposing the Gmail fetcher and sender tools."""
+
+from fastmcp import FastMCP
+
+# Single MCP server; GmailFetcher and EmailSender register their tools on it
+mcp_server = FastMCP("Gmail Auto Responder")
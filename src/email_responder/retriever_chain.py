@@ -1,23 +1,60 @@
 """Policy Retriever Chain using LangChain and vector search."""
 
+import asyncio
 import logging
 import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Optional, Dict, Any, Tuple
 from pathlib import Path
 
+import ahocorasick
 from langchain_community.vectorstores import Chroma
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_core.documents import Document
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.retrievers.multi_query import MultiQueryRetriever
-from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain.text_splitter import RecursiveCharacterTextSplitter, TextSplitter
+from langchain.retrievers.multi_query import (
+    DEFAULT_QUERY_PROMPT,
+    LineListOutputParser,
+    MultiQueryRetriever,
+)
 from langchain.schema import HumanMessage
 
 from .config import config
-from .cache_manager import cache_manager
+from .cache_manager import cache_manager, content_key
+from .cached_embeddings import CachedEmbeddings
+from .concurrency import llm_guard
+from .faiss_store import FaissPolicyStore
+from .llm_client import CLASSIFIER_GENERATION_CONFIG, with_generation_config
 
 logger = logging.getLogger(__name__)
 
+# Paragraph boundaries in policy markdown
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+
+# Metadata key prefixes for intent scores precomputed at index time
+INTENT_SCORE_PREFIX = "intent_score_"
+FILENAME_HIT_PREFIX = "filename_hit_"
+
+
+def email_query(email_subject: str, email_body: str) -> str:
+    """Build the text embedded for an email.
+    
+    Retrieval and the semantic response cache share it, so the email is
+    embedded once and the second lookup hits the query embedding cache.
+    """
+    return f"Subject: {email_subject}\nContent: {email_body}"
+
+
+def index_path() -> str:
+    """Directory of the configured vector store; Chroma and FAISS never share one."""
+    return config.faiss_db_path if config.vector_db_type == "faiss" else config.vector_db_path
+
 
 class IntentClassifier:
     """Classifies email intent to route to appropriate policies."""
@@ -31,39 +68,114 @@ class IntentClassifier:
     
     def __init__(self):
         self.llm = None
+        self._automaton = self._build_automaton()
         if config.google_api_key:
             try:
-                self.llm = ChatGoogleGenerativeAI(
-                    model="gemini-2.0-flash-exp",
-                    google_api_key=config.google_api_key,
-                    temperature=0.1
-                )
+                self.llm = with_generation_config(CLASSIFIER_GENERATION_CONFIG)
             except Exception as e:
-                logger.warning(f"Could not initialize LLM for intent classification: {e}")
+                logger.warning("Could not initialize LLM for intent classification: %s", e)
     
     def classify_intent(self, email_subject: str, email_body: str) -> str:
         """Classify email intent using keyword matching and optional LLM."""
+        return self.classify_with_confidence(email_subject, email_body)[0]
+    
+    def classify_with_confidence(self, email_subject: str, email_body: str) -> Tuple[str, float]:
+        """Classify email intent and report the keyword confidence.
         
-        # Combine subject and body for analysis
-        text = f"{email_subject} {email_body}".lower()
+        Confidence is the keyword score margin ``(top - second) / top``; it is
+        0.0 when the intent came from the LLM or the default.
+        """
+        
+        keyword_result = self._classify_by_keywords(email_subject, email_body)
+        if keyword_result:
+            return keyword_result
+        
+        # Fallback to LLM if no keywords match
+        if self.llm:
+            try:
+                response = llm_guard.call(
+                    self.llm.invoke,
+                    [HumanMessage(content=self._llm_prompt(email_subject, email_body))]
+                )
+                llm_intent = self._parse_llm_intent(response.content)
+                if llm_intent:
+                    return llm_intent, 0.0
+                    
+            except Exception as e:
+                logger.warning("LLM intent classification failed: %s", e)
+        
+        # Default fallback
+        logger.info("Using default intent: general")
+        return "general", 0.0
+    
+    async def aclassify_with_confidence(self, email_subject: str, email_body: str) -> Tuple[str, float]:
+        """Async version of ``classify_with_confidence``."""
         
-        # Keyword-based classification
-        intent_scores = {}
+        keyword_result = self._classify_by_keywords(email_subject, email_body)
+        if keyword_result:
+            return keyword_result
+        
+        if self.llm:
+            try:
+                response = await llm_guard.acall(
+                    self.llm.ainvoke,
+                    [HumanMessage(content=self._llm_prompt(email_subject, email_body))]
+                )
+                llm_intent = self._parse_llm_intent(response.content)
+                if llm_intent:
+                    return llm_intent, 0.0
+                    
+            except Exception as e:
+                logger.warning("LLM intent classification failed: %s", e)
+        
+        logger.info("Using default intent: general")
+        return "general", 0.0
+    
+    def _build_automaton(self) -> "ahocorasick.Automaton":
+        """Build an Aho-Corasick automaton over all intent keywords."""
+        keyword_intents: Dict[str, List[str]] = {}
         for intent, keywords in self.INTENTS.items():
-            score = sum(1 for keyword in keywords if keyword in text)
-            if score > 0:
-                intent_scores[intent] = score
+            for keyword in keywords:
+                keyword_intents.setdefault(keyword, []).append(intent)
+        
+        automaton = ahocorasick.Automaton()
+        for keyword, intents in keyword_intents.items():
+            automaton.add_word(keyword, (keyword, tuple(intents)))
+        automaton.make_automaton()
+        return automaton
+    
+    def keyword_scores(self, text: str) -> Dict[str, int]:
+        """Count the distinct keywords of each intent found in lowercased ``text``.
+        
+        A single automaton pass replaces one substring scan per keyword.
+        Intents are returned in ``INTENTS`` order.
+        """
+        matched = {value for _, value in self._automaton.iter(text)}
+        counts: Dict[str, int] = {}
+        for _, intents in matched:
+            for intent in intents:
+                counts[intent] = counts.get(intent, 0) + 1
+        return {intent: counts[intent] for intent in self.INTENTS if intent in counts}
+    
+    def _classify_by_keywords(self, email_subject: str, email_body: str) -> Optional[Tuple[str, float]]:
+        """Classify intent and confidence by keyword matches, or return None if nothing matches."""
+        
+        # Combine subject and body for analysis
+        intent_scores = self.keyword_scores(f"{email_subject} {email_body}".lower())
         
         # Return highest scoring intent
         if intent_scores:
             classified_intent = max(intent_scores, key=intent_scores.get)
-            logger.info(f"Classified intent as: {classified_intent}")
-            return classified_intent
-        
-        # Fallback to LLM if no keywords match
-        if self.llm:
-            try:
-                prompt = f"""Classify the following email into one of these categories:
+            top, second = (sorted(intent_scores.values(), reverse=True) + [0])[:2]
+            confidence = (top - second) / top
+            logger.info("Classified intent as: %s (confidence %.2f)", classified_intent, confidence)
+            return classified_intent, confidence
+        return None
+    
+    @staticmethod
+    def _llm_prompt(email_subject: str, email_body: str) -> str:
+        """Build the LLM classification prompt."""
+        return f"""Classify the following email into one of these categories:
 - billing: Payment, subscription, refund, invoice issues
 - technical_support: Technical problems, bugs, errors
 - feature_request: New feature requests, suggestions
@@ -73,20 +185,128 @@ Email Subject: {email_subject}
 Email Body: {email_body}
 
 Respond with only the category name:"""
-                
-                response = self.llm.invoke([HumanMessage(content=prompt)])
-                llm_intent = response.content.strip().lower()
-                
-                if llm_intent in self.INTENTS:
-                    logger.info(f"LLM classified intent as: {llm_intent}")
-                    return llm_intent
-                    
-            except Exception as e:
-                logger.warning(f"LLM intent classification failed: {e}")
+    
+    def _parse_llm_intent(self, content: str) -> Optional[str]:
+        """Validate the LLM's answer against the known intents."""
+        llm_intent = content.strip().lower()
+        if llm_intent in self.INTENTS:
+            logger.info("LLM classified intent as: %s", llm_intent)
+            return llm_intent
+        return None
+
+
+class BatchedMultiQueryRetriever(MultiQueryRetriever):
+    """Multi-query retriever that searches all generated queries in one pass.
+    
+    The stock retriever embeds and searches each generated query separately.
+    Here every query is embedded in a single batch call and the vectorstore
+    is queried once with all the vectors.
+    """
+    
+    vectorstore: Any
+    search_k: int = 4
+    
+    @classmethod
+    def from_vectorstore(cls, vectorstore: Any, llm: Any, search_k: int) -> "BatchedMultiQueryRetriever":
+        """Build the retriever with the default query-generation prompt."""
+        return cls(
+            retriever=vectorstore.as_retriever(search_kwargs={"k": search_k}),
+            llm_chain=DEFAULT_QUERY_PROMPT | llm | LineListOutputParser(),
+            vectorstore=vectorstore,
+            search_k=search_k
+        )
+    
+    def generate_queries(
+        self,
+        question: str,
+        run_manager: CallbackManagerForRetrieverRun
+    ) -> List[str]:
+        """Generate the subqueries with Gemini, through the LLM guard."""
+        return llm_guard.call(super().generate_queries, question, run_manager)
+    
+    async def agenerate_queries(
+        self,
+        question: str,
+        run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[str]:
+        """Async version of ``generate_queries``."""
+        return await llm_guard.acall(super().agenerate_queries, question, run_manager)
+    
+    def retrieve_documents(
+        self,
+        queries: List[str],
+        run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        """Run all queries against the vectorstore in a single batch."""
+        return self._search_batch(queries)
+    
+    async def aretrieve_documents(
+        self,
+        queries: List[str],
+        run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        """Run all queries against the vectorstore in a single batch."""
+        return await asyncio.to_thread(self._search_batch, queries)
+    
+    def _search_batch(self, queries: List[str]) -> List[Document]:
+        """Embed the queries together and fetch the top documents for each."""
+        return [doc for docs in self.search_queries(queries) for doc in docs]
+    
+    def search_queries(self, queries: List[str]) -> List[List[Document]]:
+        """Embed the queries together and return the top documents of each query."""
+        if not queries:
+            return []
         
-        # Default fallback
-        logger.info("Using default intent: general")
-        return "general"
+        embeddings = self.vectorstore.embeddings
+        # Prefer a query-specific batch method so queries are not cached as documents
+        embed_batch = getattr(embeddings, "embed_queries", embeddings.embed_documents)
+        vectors = embed_batch(queries)
+        
+        search_by_vectors = getattr(self.vectorstore, "search_by_vectors", None)
+        if search_by_vectors:
+            return search_by_vectors(vectors, self.search_k)
+        return self._chroma_search_by_vectors(vectors)
+    
+    def _chroma_search_by_vectors(self, vectors: List[List[float]]) -> List[List[Document]]:
+        """Query the Chroma collection once for all vectors."""
+        results = self.vectorstore._collection.query(
+            query_embeddings=vectors,
+            n_results=self.search_k,
+            include=["documents", "metadatas"]
+        )
+        return [
+            [Document(page_content=text, metadata=metadata or {}) for text, metadata in zip(texts, metadatas)]
+            for texts, metadatas in zip(results["documents"], results["metadatas"])
+        ]
+
+
+class ParagraphTextSplitter(TextSplitter):
+    """Split markdown on blank lines and greedily merge paragraphs into chunks.
+    
+    Policies are mostly short paragraphs, so one regex split replaces the
+    recursive separator search. Only paragraphs longer than a chunk fall
+    back to the recursive splitter.
+    """
+    
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._fallback = RecursiveCharacterTextSplitter(
+            chunk_size=self._chunk_size,
+            chunk_overlap=self._chunk_overlap,
+            length_function=self._length_function,
+            separators=["\n", " ", ""]
+        )
+    
+    def split_text(self, text: str) -> List[str]:
+        splits = []
+        for paragraph in _PARAGRAPH_RE.split(text):
+            if not paragraph.strip():
+                continue
+            if self._length_function(paragraph) > self._chunk_size:
+                splits.extend(self._fallback.split_text(paragraph))
+            else:
+                splits.append(paragraph)
+        return self._merge_splits(splits, "\n\n")
 
 
 class PolicyRetriever:
@@ -105,35 +325,47 @@ class PolicyRetriever:
     def _setup_embeddings(self) -> None:
         """Setup HuggingFace embeddings."""
         try:
-            self.embeddings = HuggingFaceEmbeddings(
-                model_name="sentence-transformers/all-MiniLM-L6-v2",
-                model_kwargs={'device': 'cpu'}
-            )
-            logger.info("Initialized HuggingFace embeddings")
+            if config.embedding_backend == "onnx":
+                from .embeddings import OnnxEmbeddings
+                embeddings = OnnxEmbeddings(config.embedding_model, config.onnx_model_dir)
+                logger.info("Initialized ONNX Runtime embeddings")
+            else:
+                # Unit-length vectors make cosine similarity a plain inner product
+                embeddings = HuggingFaceEmbeddings(
+                    model_name=config.embedding_model,
+                    model_kwargs={'device': 'cpu'},
+                    encode_kwargs={'normalize_embeddings': True}
+                )
+                logger.info("Initialized HuggingFace embeddings")
+            
+            # Retrieval and the semantic response cache embed the same texts
+            self.embeddings = CachedEmbeddings(embeddings, config.embedding_cache_size)
         except Exception as e:
-            logger.error(f"Failed to setup embeddings: {e}")
+            logger.error("Failed to setup embeddings: %s", e)
     
     def _setup_text_splitter(self) -> None:
         """Setup text splitter for document chunking."""
-        self.text_splitter = RecursiveCharacterTextSplitter(
+        self.text_splitter = ParagraphTextSplitter(
             chunk_size=config.chunk_size,
             chunk_overlap=config.chunk_overlap,
-            length_function=len,
-            separators=["\n\n", "\n", " ", ""]
+            length_function=len
         )
     
     def _initialize_vectorstore(self) -> None:
         """Initialize or load existing vectorstore."""
-        persist_directory = config.vector_db_path
+        persist_directory = index_path()
         
         try:
-            if os.path.exists(persist_directory) and os.listdir(persist_directory):
+            if config.vector_db_type == "faiss" and FaissPolicyStore.exists(persist_directory):
+                self.vectorstore = FaissPolicyStore.load(persist_directory, self.embeddings)
+                logger.info("Loaded existing FAISS index from %s", persist_directory)
+            elif config.vector_db_type != "faiss" and os.path.exists(persist_directory) and os.listdir(persist_directory):
                 # Load existing vectorstore
                 self.vectorstore = Chroma(
                     persist_directory=persist_directory,
                     embedding_function=self.embeddings
                 )
-                logger.info(f"Loaded existing vectorstore from {persist_directory}")
+                logger.info("Loaded existing vectorstore from %s", persist_directory)
             else:
                 # Create new vectorstore
                 self._build_vectorstore()
@@ -142,7 +374,7 @@ class PolicyRetriever:
                 self._setup_retriever()
                 
         except Exception as e:
-            logger.error(f"Failed to initialize vectorstore: {e}")
+            logger.error("Failed to initialize vectorstore: %s", e)
     
     def _build_vectorstore(self) -> None:
         """Build vectorstore from policy documents."""
@@ -157,22 +389,38 @@ class PolicyRetriever:
         
         # Split documents into chunks
         chunked_docs = self.text_splitter.split_documents(documents)
-        logger.info(f"Split {len(documents)} documents into {len(chunked_docs)} chunks")
+        logger.info("Split %s documents into %s chunks", len(documents), len(chunked_docs))
+        
+        for chunk in chunked_docs:
+            self._annotate_intent_scores(chunk)
+        
+        # Cached replies quote the old policies
+        cache_manager.clear_semantic_cache()
         
         try:
+            if config.vector_db_type == "faiss":
+                self.vectorstore = FaissPolicyStore.from_documents(
+                    chunked_docs,
+                    self.embeddings,
+                    config.faiss_db_path
+                )
+                logger.info("Built and persisted FAISS index to %s", config.faiss_db_path)
+                return
+            
             # Create vectorstore
             self.vectorstore = Chroma.from_documents(
                 documents=chunked_docs,
                 embedding=self.embeddings,
-                persist_directory=config.vector_db_path
+                persist_directory=config.vector_db_path,
+                collection_metadata={"hnsw:space": "ip"}
             )
             
             # Persist the vectorstore
             self.vectorstore.persist()
-            logger.info(f"Built and persisted vectorstore to {config.vector_db_path}")
+            logger.info("Built and persisted vectorstore to %s", config.vector_db_path)
             
         except Exception as e:
-            logger.error(f"Failed to build vectorstore: {e}")
+            logger.error("Failed to build vectorstore: %s", e)
     
     def _load_policy_documents(self) -> List[Document]:
         """Load policy documents from markdown files."""
@@ -180,32 +428,37 @@ class PolicyRetriever:
         policies_dir = Path(config.policies_dir)
         
         if not policies_dir.exists():
-            logger.error(f"Policies directory not found: {policies_dir}")
+            logger.error("Policies directory not found: %s", policies_dir)
             return documents
         
-        for md_file in policies_dir.glob("*.md"):
-            try:
-                with open(md_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                # Create document with metadata
-                doc = Document(
-                    page_content=content,
-                    metadata={
-                        "source": str(md_file),
-                        "filename": md_file.name,
-                        "type": "policy"
-                    }
-                )
-                documents.append(doc)
-                logger.debug(f"Loaded policy document: {md_file.name}")
-                
-            except Exception as e:
-                logger.error(f"Failed to load {md_file}: {e}")
+        # Reads are I/O-bound and release the GIL, so load files in parallel
+        md_files = list(policies_dir.glob("*.md"))
+        if md_files:
+            with ThreadPoolExecutor(max_workers=min(32, len(md_files))) as executor:
+                documents = [doc for doc in executor.map(self._load_policy_document, md_files) if doc]
         
-        logger.info(f"Loaded {len(documents)} policy documents")
+        logger.info("Loaded %s policy documents", len(documents))
         return documents
     
+    def _load_policy_document(self, md_file: Path) -> Optional[Document]:
+        """Load a single policy document, or None if it cannot be read."""
+        try:
+            content = md_file.read_text(encoding='utf-8')
+        except Exception as e:
+            logger.error("Failed to load %s: %s", md_file, e)
+            return None
+        
+        logger.debug("Loaded policy document: %s", md_file.name)
+        # Create document with metadata
+        return Document(
+            page_content=content,
+            metadata={
+                "source": str(md_file),
+                "filename": md_file.name,
+                "type": "policy"
+            }
+        )
+    
     def _setup_retriever(self) -> None:
         """Setup multi-query retriever."""
         if not self.vectorstore:
@@ -215,15 +468,15 @@ class PolicyRetriever:
         try:
             # Base retriever
             base_retriever = self.vectorstore.as_retriever(
-                search_type="similarity",
                 search_kwargs={"k": config.top_k_docs}
             )
             
             # Multi-query retriever for enhanced results
             if self.intent_classifier.llm:
-                self.retriever = MultiQueryRetriever.from_llm(
-                    retriever=base_retriever,
-                    llm=self.intent_classifier.llm
+                self.retriever = BatchedMultiQueryRetriever.from_vectorstore(
+                    vectorstore=self.vectorstore,
+                    llm=self.intent_classifier.llm,
+                    search_k=config.top_k_docs
                 )
                 logger.info("Setup multi-query retriever with LLM")
             else:
@@ -231,7 +484,7 @@ class PolicyRetriever:
                 logger.info("Setup basic similarity retriever")
                 
         except Exception as e:
-            logger.error(f"Failed to setup retriever: {e}")
+            logger.error("Failed to setup retriever: %s", e)
             # Fallback to basic retriever
             self.retriever = self.vectorstore.as_retriever()
     
@@ -247,56 +500,190 @@ class PolicyRetriever:
             logger.error("Retriever not initialized")
             return [], "general"
         
+        # Check cache first; a hit also skips intent classification
+        cache_key = content_key(intent or "", email_subject, email_body)
+        cached = self._get_cached_retrieval(cache_key)
+        if cached:
+            return cached
+        
         # Classify intent if not provided
+        confidence = 0.0
         if not intent:
-            intent = self.intent_classifier.classify_intent(email_subject, email_body)
+            intent, confidence = self.intent_classifier.classify_with_confidence(email_subject, email_body)
         
         # Create search query
-        query = f"Subject: {email_subject}\nContent: {email_body}"
-        
-        # Check cache first
-        cache_key = f"retrieval_{intent}_{hash(query) % 10000}"
-        cached_docs = cache_manager.get("retrieval", cache_key)
-        if cached_docs:
-            logger.debug("Retrieved documents from cache")
-            return cached_docs, intent
+        query = email_query(email_subject, email_body)
         
         try:
             # Retrieve documents
-            documents = self.retriever.invoke(query)
-            
-            # Filter and rank documents by intent relevance
-            ranked_docs = self._rank_documents_by_intent(documents, intent)
-            
-            # Cache the results
-            cache_manager.set("retrieval", cache_key, ranked_docs)
+            if self._use_plain_search(confidence):
+                documents = self._plain_retriever().invoke(query)
+            else:
+                documents = self.retriever.invoke(query)
             
-            logger.info(f"Retrieved {len(ranked_docs)} relevant documents for intent: {intent}")
-            return ranked_docs, intent
+            return self._finish_retrieval(cache_key, documents, intent)
             
         except Exception as e:
-            logger.error(f"Error retrieving documents: {e}")
+            logger.error("Error retrieving documents: %s", e)
             return [], intent
     
+    async def abatch_retrieve(self, emails: List[Tuple[str, str]]) -> List[Tuple[List[Document], str]]:
+        """Retrieve policies for many ``(subject, body)`` pairs at once.
+        
+        Cache hits are looked up, and new results stored, in one cache round
+        trip each. Emails whose keyword intent is decisive are embedded in one
+        call and searched with one vector store query; the rest go through
+        the multi-query retriever concurrently.
+        
+        Returns:
+            List of ``(documents, intent)`` for each email, in order
+        """
+        if not self.retriever:
+            logger.error("Retriever not initialized")
+            return [([], "general") for _ in emails]
+        
+        results: List[Optional[Tuple[List[Document], str]]] = [None] * len(emails)
+        cache_keys = [content_key("", subject, body) for subject, body in emails]
+        cached = cache_manager.get_many("retrieval", cache_keys)
+        pending = []
+        for i, cache_key in enumerate(cache_keys):
+            if cache_key in cached:
+                results[i] = self._decode_retrieval(cached[cache_key])
+            else:
+                pending.append(i)
+        
+        # New results, written to the cache together at the end
+        fresh: Dict[str, Any] = {}
+        
+        classified = await asyncio.gather(*(
+            self.intent_classifier.aclassify_with_confidence(*emails[i]) for i in pending
+        ))
+        plain = [(i, intent) for i, (intent, confidence) in zip(pending, classified) if self._use_plain_search(confidence)]
+        multi = [(i, intent) for i, (intent, confidence) in zip(pending, classified) if not self._use_plain_search(confidence)]
+        
+        async def retrieve_multi(i: int, intent: str) -> Tuple[List[Document], str]:
+            try:
+                documents = await self.retriever.ainvoke(email_query(*emails[i]))
+                return self._finish_retrieval(cache_keys[i], documents, intent, fresh)
+            except Exception as e:
+                logger.error("Error retrieving documents: %s", e)
+                return [], intent
+        
+        async def retrieve_plain() -> List[Tuple[List[Document], str]]:
+            if not plain:
+                return []
+            try:
+                found = await asyncio.to_thread(self._search_queries, [email_query(*emails[i]) for i, _ in plain])
+            except Exception as e:
+                logger.error("Error retrieving documents: %s", e)
+                return [([], intent) for _, intent in plain]
+            return [
+                self._finish_retrieval(cache_keys[i], documents, intent, fresh)
+                for (i, intent), documents in zip(plain, found)
+            ]
+        
+        plain_results, *multi_results = await asyncio.gather(
+            retrieve_plain(),
+            *(retrieve_multi(i, intent) for i, intent in multi)
+        )
+        for (i, _), result in zip(plain + multi, plain_results + multi_results):
+            results[i] = result
+        
+        if fresh:
+            cache_manager.set_many("retrieval", fresh)
+        return results
+    
+    def _search_queries(self, queries: List[str]) -> List[List[Document]]:
+        """Plain similarity search for several queries, batched when the retriever supports it."""
+        if not queries:
+            return []
+        if isinstance(self.retriever, BatchedMultiQueryRetriever):
+            return self.retriever.search_queries(queries)
+        return [self._plain_retriever().invoke(query) for query in queries]
+    
+    def _finish_retrieval(
+        self,
+        cache_key: str,
+        documents: List[Document],
+        intent: str,
+        fresh: Optional[Dict[str, Any]] = None
+    ) -> Tuple[List[Document], str]:
+        """Rank retrieved documents by intent relevance and cache the result.
+        
+        With ``fresh``, the result is added to it for the caller to cache in
+        bulk instead of being written immediately.
+        """
+        ranked_docs = self._rank_documents_by_intent(documents, intent)
+        if fresh is None:
+            cache_manager.set("retrieval", cache_key, self._encode_retrieval(ranked_docs, intent))
+        else:
+            fresh[cache_key] = self._encode_retrieval(ranked_docs, intent)
+        
+        logger.info("Retrieved %s relevant documents for intent: %s", len(ranked_docs), intent)
+        return ranked_docs, intent
+    
+    @classmethod
+    def _get_cached_retrieval(cls, cache_key: str) -> Optional[Tuple[List[Document], str]]:
+        """Look up the documents and intent previously retrieved for an email."""
+        cached = cache_manager.get("retrieval", cache_key)
+        if not cached:
+            return None
+        
+        logger.debug("Retrieved documents from cache")
+        return cls._decode_retrieval(cached)
+    
+    @staticmethod
+    def _decode_retrieval(cached: Dict[str, Any]) -> Tuple[List[Document], str]:
+        """Rebuild documents and intent from a cached retrieval result."""
+        documents = [Document(page_content=text, metadata=metadata) for text, metadata in cached["documents"]]
+        return documents, cached["intent"]
+    
+    @staticmethod
+    def _encode_retrieval(documents: List[Document], intent: str) -> Dict[str, Any]:
+        """Encode retrieval results as plain data so they survive msgpack (Redis)."""
+        return {
+            "intent": intent,
+            "documents": [(doc.page_content, doc.metadata) for doc in documents]
+        }
+    
+    @staticmethod
+    def _use_plain_search(confidence: float) -> bool:
+        """Check whether keywords are decisive enough to skip query generation."""
+        return confidence >= config.keyword_confidence_threshold
+    
+    def _plain_retriever(self) -> Any:
+        """Get the similarity retriever underneath the multi-query retriever."""
+        return getattr(self.retriever, "retriever", self.retriever)
+    
+    def _annotate_intent_scores(self, doc: Document) -> None:
+        """Store per-intent keyword scores in the document metadata.
+        
+        Chroma metadata values must be scalars, so each intent gets flat
+        ``intent_score_<intent>`` and ``filename_hit_<intent>`` entries.
+        """
+        classifier = self.intent_classifier
+        content_scores = classifier.keyword_scores(doc.page_content.lower())
+        filename_scores = classifier.keyword_scores(doc.metadata.get("filename", "").lower())
+        for intent in classifier.INTENTS:
+            doc.metadata[f"{INTENT_SCORE_PREFIX}{intent}"] = content_scores.get(intent, 0)
+            doc.metadata[f"{FILENAME_HIT_PREFIX}{intent}"] = int(intent in filename_scores)
+    
     def _rank_documents_by_intent(self, documents: List[Document], intent: str) -> List[Document]:
         """Rank documents by relevance to classified intent."""
         if not documents:
             return documents
         
-        # Intent-based keywords for ranking
-        intent_keywords = self.intent_classifier.INTENTS.get(intent, [])
-        
-        # Score documents based on intent keyword matches
+        # Score documents from the intent scores stored at index time
+        score_key = f"{INTENT_SCORE_PREFIX}{intent}"
+        filename_key = f"{FILENAME_HIT_PREFIX}{intent}"
         scored_docs = []
         for doc in documents:
-            content_lower = doc.page_content.lower()
-            score = sum(1 for keyword in intent_keywords if keyword in content_lower)
+            if score_key not in doc.metadata:
+                # Indexed before scores were stored
+                self._annotate_intent_scores(doc)
             
             # Boost score if filename matches intent
-            filename = doc.metadata.get("filename", "").lower()
-            if any(keyword in filename for keyword in intent_keywords):
-                score += 2
-            
+            score = doc.metadata[score_key] + 2 * doc.metadata[filename_key]
             scored_docs.append((score, doc))
         
         # Sort by score (descending) and return documents
@@ -310,9 +697,9 @@ class PolicyRetriever:
         """Refresh the vector index with latest policy documents."""
         try:
             # Remove existing vectorstore
-            if os.path.exists(config.vector_db_path):
+            if os.path.exists(index_path()):
                 import shutil
-                shutil.rmtree(config.vector_db_path)
+                shutil.rmtree(index_path())
                 logger.info("Removed existing vectorstore")
             
             # Rebuild vectorstore
@@ -321,11 +708,12 @@ class PolicyRetriever:
             if self.vectorstore:
                 self._setup_retriever()
                 cache_manager.clear_cache()
+                self.embeddings.clear()
                 logger.info("Successfully refreshed policy index")
                 return True
                 
         except Exception as e:
-            logger.error(f"Failed to refresh index: {e}")
+            logger.error("Failed to refresh index: %s", e)
             
         return False
     
@@ -335,20 +723,35 @@ class PolicyRetriever:
             "vectorstore_exists": self.vectorstore is not None,
             "retriever_ready": self.retriever is not None,
             "embeddings_ready": self.embeddings is not None,
-            "index_path": config.vector_db_path,
+            "index_path": index_path(),
             "policies_dir": config.policies_dir
         }
         
         if self.vectorstore:
             try:
-                # Try to get collection info if available
-                collection = self.vectorstore._collection
-                stats["document_count"] = collection.count()
+                if isinstance(self.vectorstore, FaissPolicyStore):
+                    stats["document_count"] = self.vectorstore.count()
+                else:
+                    # Try to get collection info if available
+                    collection = self.vectorstore._collection
+                    stats["document_count"] = collection.count()
             except:
                 stats["document_count"] = "unknown"
         
         return stats
 
 
-# Global policy retriever instance
-policy_retriever = PolicyRetriever() 
\ No newline at end of file
+# Global policy retriever instance, created on first access (PEP 562) so that
+# importing this module does not load models or open connections
+_instance: Optional[PolicyRetriever] = None
+_instance_lock = threading.Lock()
+
+
+def __getattr__(name: str) -> Any:
+    global _instance
+    if name == "policy_retriever":
+        with _instance_lock:
+            if _instance is None:
+                _instance = PolicyRetriever()
+        return _instance
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
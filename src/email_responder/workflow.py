@@ -1,10 +1,14 @@
 """LangGraph workflow orchestration for email processing pipeline."""
 
+import asyncio
 import logging
-from typing import Dict, List, Any, Optional, TypedDict
-from dataclasses import asdict
+import operator
+import re
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Annotated, ClassVar, Dict, List, Any, NamedTuple, Optional, Tuple
 
-from langgraph.graph import Graph, END
+from langgraph.graph import StateGraph, END
 from langgraph.checkpoint.memory import MemorySaver
 
 from .gmail_fetcher import gmail_fetcher, EmailData
@@ -16,350 +20,439 @@ from .cache_manager import cache_manager
 
 logger = logging.getLogger(__name__)
 
+# Reuse component status for this long so frequent health checks do not re-probe every backend
+STATUS_CACHE_SECONDS = 30
 
-class EmailProcessingState(TypedDict):
-    """State structure for the email processing workflow."""
+# Subjects of autoresponders and delivery notices, which never get a reply
+_AUTO_REPLY_RE = re.compile(
+    r"^\s*(auto(matic)?[- ]?(reply|response)|out of (the )?office|undeliverable|delivery status notification"
+    r"|mail delivery (failed|failure)|returned mail)",
+    re.IGNORECASE
+)
+
+# System senders that cannot receive a reply
+_AUTOMATED_SENDER_RE = re.compile(r"^(mailer-daemon|postmaster|no-?reply)@", re.IGNORECASE)
+
+
+class WorkflowEmail(NamedTuple):
+    """The fields of an email the workflow reads, kept compact for graph state."""
+    
+    message_id: str
+    thread_id: str
+    sender_email: str
+    sender_name: str
+    subject: str
+    body: str
+    prefers_plain_text: bool = False
+    is_automated: bool = False
+    
+    @classmethod
+    def from_email_data(cls, email: EmailData) -> "WorkflowEmail":
+        """Project a fetched email onto the workflow fields."""
+        return cls(
+            message_id=email.id,
+            thread_id=email.thread_id,
+            sender_email=email.sender_email,
+            sender_name=email.sender,
+            subject=email.subject,
+            body=email.body,
+            prefers_plain_text=email.prefers_plain_text,
+            is_automated=email.is_automated
+        )
+    
+    def needs_reply(self) -> bool:
+        """Check that the email is not an autoresponder, bounce or bulk mail."""
+        return not (
+            self.is_automated
+            or _AUTO_REPLY_RE.match(self.subject)
+            or _AUTOMATED_SENDER_RE.match(self.sender_email)
+        )
+
+
+@dataclass(slots=True)
+class EmailProcessingState:
+    """State structure for the email processing workflow.
+    
+    Nodes read fields as attributes and return a dict of only the keys they
+    change. Counters and the log use add reducers, so nodes emit increments
+    and new lines and LangGraph merges them without any node copying the
+    accumulated values.
+    """
     
     # Input data
-    emails: List[EmailData]
-    current_email: Optional[EmailData]
+    emails: List[WorkflowEmail] = field(default_factory=list)
     
     # Processing state
-    processed_count: int
-    successful_responses: int
-    failed_responses: int
-    
-    # Current email processing
-    intent: Optional[str]
-    relevant_docs: List[Any]  # Documents
-    generated_response: Optional[str]
-    send_result: Optional[Dict[str, Any]]
+    total_emails: int = 0
+    skipped_emails: int = 0
+    successful_responses: Annotated[int, operator.add] = 0
+    failed_responses: Annotated[int, operator.add] = 0
     
     # Errors and logging
-    last_error: Optional[str]
-    processing_log: List[str]
+    last_error: Optional[str] = None
+    processing_log: Annotated[List[str], operator.add] = field(default_factory=list)
+
+
+class EmailResult(NamedTuple):
+    """Outcome of processing one email."""
+    
+    email_id: str
+    success: bool
+    log: List[str]
+    error: Optional[str] = None
 
 
 class EmailWorkflow:
     """LangGraph workflow for automated email processing."""
     
-    def __init__(self):
+    # Compiled once and shared by every instance without a checkpointer
+    _COMPILED_GRAPH: ClassVar[Optional[Any]] = None
+    
+    def __init__(self, enable_checkpointing: bool = False):
+        """Create the workflow.
+        
+        Args:
+            enable_checkpointing: Save state after every node so a session can
+                be resumed by thread ID; off by default since each run is
+                independent and checkpoint writes copy the whole batch
+        """
         self.graph = None
-        self.memory = MemorySaver()
+        self.memory = MemorySaver() if enable_checkpointing else None
+        self._last_status: Optional[Dict[str, Any]] = None
+        self._last_status_at = 0.0
         self._build_workflow()
     
     def _build_workflow(self) -> None:
-        """Build the LangGraph workflow."""
+        """Get the compiled workflow, reusing the shared graph when possible.
         
-        workflow = Graph()
+        Nodes are static and keep no per-instance state, so only a
+        checkpointer (which holds session state) needs a graph of its own.
+        """
+        if self.memory is not None:
+            self.graph = self._compile_graph(self.memory)
+            return
         
-        # Add nodes
-        workflow.add_node("fetch_emails", self._fetch_emails)
-        workflow.add_node("process_email", self._process_single_email)
-        workflow.add_node("retrieve_policies", self._retrieve_policies)
-        workflow.add_node("generate_response", self._generate_response)
-        workflow.add_node("send_response", self._send_response)
-        workflow.add_node("next_email", self._next_email)
-        workflow.add_node("finalize", self._finalize_processing)
+        if EmailWorkflow._COMPILED_GRAPH is None:
+            EmailWorkflow._COMPILED_GRAPH = self._compile_graph(None)
+        self.graph = EmailWorkflow._COMPILED_GRAPH
+    
+    @classmethod
+    def _compile_graph(cls, checkpointer: Optional[MemorySaver]) -> Any:
+        """Build and compile the LangGraph workflow.
         
-        # Define workflow edges
-        workflow.set_entry_point("fetch_emails")
+        Emails are independent, so one node processes the whole batch and
+        the per-email stages are plain coroutine calls, not graph nodes.
+        """
         
-        # From fetch_emails
-        workflow.add_conditional_edges(
-            "fetch_emails",
-            self._should_process_emails,
-            {
-                "process": "process_email",
-                "complete": "finalize"
-            }
-        )
+        workflow = StateGraph(EmailProcessingState)
         
-        # Email processing chain
-        workflow.add_edge("process_email", "retrieve_policies")
-        workflow.add_edge("retrieve_policies", "generate_response")
-        workflow.add_edge("generate_response", "send_response")
-        
-        # After sending response
-        workflow.add_conditional_edges(
-            "send_response",
-            self._should_continue_processing,
-            {
-                "continue": "next_email",
-                "complete": "finalize"
-            }
-        )
+        # Add nodes
+        workflow.add_node("fetch_emails", cls._fetch_emails)
+        workflow.add_node("triage", cls._triage)
+        workflow.add_node("process_batch", cls._process_batch)
+        workflow.add_node("finalize", cls._finalize_processing)
         
-        # Continue with next email
-        workflow.add_edge("next_email", "process_email")
+        # Define workflow edges
+        workflow.set_entry_point("fetch_emails")
+        workflow.add_edge("fetch_emails", "triage")
+        workflow.add_edge("triage", "process_batch")
+        workflow.add_edge("process_batch", "finalize")
         
         # End workflow
         workflow.add_edge("finalize", END)
         
-        # Compile workflow with memory
-        self.graph = workflow.compile(checkpointer=self.memory)
+        # Compile workflow, with memory only if checkpointing was requested
+        graph = workflow.compile(checkpointer=checkpointer)
         
         logger.info("Email processing workflow compiled successfully")
+        return graph
     
-    def _fetch_emails(self, state: EmailProcessingState) -> EmailProcessingState:
+    @staticmethod
+    async def _fetch_emails(state: EmailProcessingState) -> Dict[str, Any]:
         """Fetch unread emails from Gmail."""
         
         logger.info("Starting email fetch process")
         
         try:
-            # Fetch unread emails
-            emails = gmail_fetcher.fetch_unread_emails(limit=config.max_emails_per_batch)
-            
-            state["emails"] = emails
-            state["processed_count"] = 0
-            state["successful_responses"] = 0
-            state["failed_responses"] = 0
-            state["processing_log"] = [f"Fetched {len(emails)} unread emails"]
-            
-            logger.info(f"Fetched {len(emails)} unread emails for processing")
+            # Fetch headers only; _triage downloads bodies for the emails that get a reply
+            fetched = await gmail_fetcher.fetch_unread_emails_async(
+                max_results=config.max_emails_per_batch,
+                include_body=False
+            )
+            emails = [WorkflowEmail.from_email_data(email) for email in fetched]
+            logger.info("Fetched %s unread emails for processing", len(emails))
             
         except Exception as e:
             error_msg = f"Failed to fetch emails: {e}"
             logger.error(error_msg)
-            state["last_error"] = error_msg
-            state["emails"] = []
-            state["processing_log"] = [error_msg]
-        
-        return state
-    
-    def _should_process_emails(self, state: EmailProcessingState) -> str:
-        """Determine if there are emails to process."""
-        emails = state.get("emails", [])
-        if emails and len(emails) > 0:
-            return "process"
-        return "complete"
+            return {"emails": [], "total_emails": 0, "last_error": error_msg, "processing_log": [error_msg]}
+        
+        # Claim the whole batch (read + processed label); unclaimed emails stay
+        # unread for the next run, so only claimed ones are answered
+        log = [f"Fetched {len(emails)} unread emails"]
+        claimed = set(await gmail_fetcher.claim_emails_async([email.message_id for email in emails]))
+        if len(claimed) < len(emails):
+            log_msg = f"Failed to claim {len(emails) - len(claimed)} emails, leaving them for the next run"
+            logger.warning(log_msg)
+            log.append(log_msg)
+            emails = [email for email in emails if email.message_id in claimed]
+        
+        return {"emails": emails, "total_emails": len(emails), "processing_log": log}
     
-    def _process_single_email(self, state: EmailProcessingState) -> EmailProcessingState:
-        """Process a single email from the queue."""
-        
-        emails = state.get("emails", [])
-        processed_count = state.get("processed_count", 0)
+    @classmethod
+    async def _triage(cls, state: EmailProcessingState) -> Dict[str, Any]:
+        """Drop autoresponders, bounces and bulk mail, then load bodies of the rest.
         
-        if processed_count < len(emails):
-            current_email = emails[processed_count]
-            state["current_email"] = current_email
-            
-            log_msg = f"Processing email {processed_count + 1}/{len(emails)}: {current_email.subject}"
+        Triage needs only headers, so bodies are downloaded just for emails
+        that get a reply. Skipped emails were already claimed when fetched,
+        so they stay read and are not picked up again.
+        """
+        emails = state.emails
+        to_answer = [email for email in emails if email.needs_reply()]
+        skipped = len(emails) - len(to_answer)
+        update: Dict[str, Any] = {"processing_log": []}
+        if skipped:
+            log_msg = f"Skipped {skipped} automated emails"
             logger.info(log_msg)
-            
-            processing_log = state.get("processing_log", [])
-            processing_log.append(log_msg)
-            state["processing_log"] = processing_log
-            
-            # Mark email as being processed
-            try:
-                gmail_fetcher.mark_as_read(current_email.message_id)
-            except Exception as e:
-                logger.warning(f"Failed to mark email as read: {e}")
-        
-        return state
-    
-    def _retrieve_policies(self, state: EmailProcessingState) -> EmailProcessingState:
-        """Retrieve relevant policy documents for the current email."""
-        
-        current_email = state.get("current_email")
-        if not current_email:
-            state["last_error"] = "No current email to process"
-            return state
+            update["skipped_emails"] = skipped
+            update["processing_log"].append(log_msg)
         
         try:
-            # Retrieve relevant documents and intent
-            relevant_docs, intent = policy_retriever.retrieve_relevant_policies(
-                email_subject=current_email.subject,
-                email_body=current_email.body
-            )
-            
-            state["relevant_docs"] = relevant_docs
-            state["intent"] = intent
-            
-            log_msg = f"Retrieved {len(relevant_docs)} relevant documents for intent: {intent}"
-            logger.info(log_msg)
-            
-            processing_log = state.get("processing_log", [])
-            processing_log.append(log_msg)
-            state["processing_log"] = processing_log
-            
+            bodies = await gmail_fetcher.fetch_email_bodies_async([email.message_id for email in to_answer])
         except Exception as e:
-            error_msg = f"Failed to retrieve policies: {e}"
-            logger.error(error_msg)
-            state["last_error"] = error_msg
-            state["relevant_docs"] = []
-            state["intent"] = "general"
-        
-        return state
+            logger.error("Failed to fetch email bodies: %s", e)
+            bodies = {}
+        
+        missing = [email.message_id for email in to_answer if email.message_id not in bodies]
+        if missing:
+            log_msg = f"Failed to fetch {len(missing)} email bodies, returning them to the inbox"
+            logger.warning(log_msg)
+            update["processing_log"].append(log_msg)
+            update["failed_responses"] = len(missing)
+            update["last_error"] = log_msg
+            await cls._release(missing)
+        
+        update["emails"] = [
+            email._replace(body=bodies[email.message_id]) for email in to_answer if email.message_id in bodies
+        ]
+        return update
     
-    def _generate_response(self, state: EmailProcessingState) -> EmailProcessingState:
-        """Generate email response using LLM."""
-        
-        current_email = state.get("current_email")
-        relevant_docs = state.get("relevant_docs", [])
-        
-        if not current_email:
-            state["last_error"] = "No current email to generate response for"
-            return state
-        
+    @staticmethod
+    async def _release(email_ids: List[str]) -> None:
+        """Return unanswered emails to the inbox so the next run retries them."""
         try:
-            # Generate response using LLM chain
-            response = llm_response_chain.generate_response(
-                email_subject=current_email.subject,
-                email_body=current_email.body,
-                sender_name=current_email.sender_name,
-                context_documents=relevant_docs
-            )
-            
-            state["generated_response"] = response
-            
-            if response:
-                log_msg = f"Generated response ({len(response)} chars)"
-                logger.info(log_msg)
-            else:
-                log_msg = "Failed to generate response"
-                logger.warning(log_msg)
-                state["last_error"] = "LLM failed to generate response"
-            
-            processing_log = state.get("processing_log", [])
-            processing_log.append(log_msg)
-            state["processing_log"] = processing_log
-            
+            released = await gmail_fetcher.release_emails_async(email_ids)
         except Exception as e:
-            error_msg = f"Failed to generate response: {e}"
-            logger.error(error_msg)
-            state["last_error"] = error_msg
-            state["generated_response"] = None
-        
-        return state
+            logger.error("Failed to release unanswered emails: %s", e)
+            released = False
+        if not released:
+            logger.warning("Failed to mark %s unanswered emails as unread", len(email_ids))
     
-    def _send_response(self, state: EmailProcessingState) -> EmailProcessingState:
-        """Send the generated email response."""
-        
-        current_email = state.get("current_email")
-        generated_response = state.get("generated_response")
-        
-        if not current_email or not generated_response:
-            error_msg = "Missing email or response for sending"
-            state["last_error"] = error_msg
-            state["failed_responses"] = state.get("failed_responses", 0) + 1
-            return state
+    @classmethod
+    async def _process_batch(cls, state: EmailProcessingState) -> Dict[str, Any]:
+        """Process every fetched email concurrently and aggregate the results."""
+        
+        emails = state.emails
+        if not emails:
+            return {}
+        
+        retrieved = await cls._retrieve_all(emails)
+        
+        if config.use_batch_api:
+            results = await cls._process_with_batch_api(emails, retrieved)
+        else:
+            outcomes = await asyncio.gather(
+                *(cls._process_one_email(email, docs, intent) for email, (docs, intent) in zip(emails, retrieved)),
+                return_exceptions=True
+            )
+            results = cls._collect_results(emails, outcomes)
+        
+        update: Dict[str, Any] = {"processing_log": []}
+        failed_ids = []
+        for result in results:
+            update["processing_log"].extend(result.log)
+            if not result.success:
+                failed_ids.append(result.email_id)
+                update["last_error"] = result.error
+        
+        if failed_ids:
+            await cls._release(failed_ids)
+        
+        update["successful_responses"] = len(results) - len(failed_ids)
+        update["failed_responses"] = len(failed_ids)
+        return update
+    
+    @staticmethod
+    def _collect_results(emails: List[WorkflowEmail], outcomes: List[Any]) -> List[EmailResult]:
+        """Turn gathered outcomes into results, recording exceptions as failed emails."""
+        return [
+            EmailResult(
+                email.message_id, False, [f"Error processing email {email.message_id}: {outcome}"], str(outcome)
+            )
+            if isinstance(outcome, Exception) else outcome
+            for email, outcome in zip(emails, outcomes)
+        ]
+    
+    @staticmethod
+    async def _retrieve_all(emails: List[WorkflowEmail]) -> List[Tuple[List[Any], Optional[str]]]:
+        """Retrieve relevant policy documents and the intent for every email of the batch.
         
+        One call for the whole batch, so the emails share an embedding call
+        and a vector store query instead of searching one by one.
+        """
         try:
-            # Send email response
-            success = email_sender.send_response_email(
-                to_email=current_email.sender_email,
-                subject=current_email.subject,
-                body=generated_response,
-                original_message_id=current_email.message_id,
-                thread_id=current_email.thread_id
-            )
-            
-            if success:
-                state["successful_responses"] = state.get("successful_responses", 0) + 1
-                log_msg = f"Successfully sent response to {current_email.sender_email}"
-                logger.info(log_msg)
-            else:
-                state["failed_responses"] = state.get("failed_responses", 0) + 1
-                log_msg = f"Failed to send response to {current_email.sender_email}"
-                logger.error(log_msg)
-                state["last_error"] = "Email sending failed"
-            
-            processing_log = state.get("processing_log", [])
-            processing_log.append(log_msg)
-            state["processing_log"] = processing_log
-            
-            state["send_result"] = {"success": success}
-            
+            return await policy_retriever.abatch_retrieve([(email.subject, email.body) for email in emails])
         except Exception as e:
-            error_msg = f"Error sending response: {e}"
-            logger.error(error_msg)
-            state["last_error"] = error_msg
-            state["failed_responses"] = state.get("failed_responses", 0) + 1
-        
-        return state
+            logger.error("Failed to retrieve policies for batch: %s", e)
+            return [([], None) for _ in emails]
     
-    def _next_email(self, state: EmailProcessingState) -> EmailProcessingState:
-        """Move to the next email in the queue."""
-        
-        processed_count = state.get("processed_count", 0)
-        state["processed_count"] = processed_count + 1
-        
-        # Clear current email state
-        state["current_email"] = None
-        state["intent"] = None
-        state["relevant_docs"] = []
-        state["generated_response"] = None
-        state["send_result"] = None
-        state["last_error"] = None
+    @staticmethod
+    def _log_retrieval(relevant_docs: List[Any], intent: Optional[str], log: List[str]) -> None:
+        """Record the retrieval outcome for one email."""
+        log_msg = f"Retrieved {len(relevant_docs)} relevant documents for intent: {intent}"
+        logger.info(log_msg)
+        log.append(log_msg)
+    
+    @staticmethod
+    async def _send(email: WorkflowEmail, response: Optional[str], log: List[str]) -> EmailResult:
+        """Send the response for one email and record the outcome."""
+        if not response:
+            log_msg = f"Failed to generate response for {email.message_id}"
+            logger.warning(log_msg)
+            log.append(log_msg)
+            return EmailResult(email.message_id, False, log, "LLM failed to generate response")
+        
+        success = await email_sender.send_response_email_async(
+            to_email=email.sender_email,
+            subject=email.subject,
+            body=response,
+            original_message_id=email.message_id,
+            thread_id=email.thread_id,
+            prefer_plain=email.prefers_plain_text
+        )
         
-        return state
+        if success:
+            log_msg = f"Successfully sent response to {email.sender_email}"
+            logger.info(log_msg)
+        else:
+            log_msg = f"Failed to send response to {email.sender_email}"
+            logger.error(log_msg)
+        log.append(log_msg)
+        return EmailResult(email.message_id, success, log, None if success else "Email sending failed")
     
-    def _should_continue_processing(self, state: EmailProcessingState) -> str:
-        """Determine if there are more emails to process."""
+    @classmethod
+    async def _process_one_email(
+        cls,
+        email: WorkflowEmail,
+        relevant_docs: List[Any],
+        intent: Optional[str]
+    ) -> EmailResult:
+        """Generate and send the response for one email from its retrieved policies.
+        
+        Each reply is sent as soon as it is ready, while other emails of the
+        batch are still waiting on Gemini.
+        """
+        log: List[str] = []
+        cls._log_retrieval(relevant_docs, intent, log)
+        
+        response = await llm_response_chain.agenerate_response(
+            email_subject=email.subject,
+            email_body=email.body,
+            sender_name=email.sender_name,
+            context_documents=relevant_docs,
+            intent=intent
+        )
+        if response:
+            log_msg = f"Generated response ({len(response)} chars)"
+            logger.info(log_msg)
+            log.append(log_msg)
         
-        emails = state.get("emails", [])
-        processed_count = state.get("processed_count", 0)
+        return await cls._send(email, response, log)
+    
+    @classmethod
+    async def _process_with_batch_api(
+        cls,
+        emails: List[WorkflowEmail],
+        retrieved: List[Tuple[List[Any], Optional[str]]]
+    ) -> List[EmailResult]:
+        """Generate all responses as one Gemini Batch API job, then send them."""
+        logs: List[List[str]] = [[] for _ in emails]
+        for (docs, intent), log in zip(retrieved, logs):
+            cls._log_retrieval(docs, intent, log)
+        
+        # Blocks while polling the batch job, so run it in a thread
+        try:
+            responses = await asyncio.to_thread(llm_response_chain.generate_responses_batch, [
+                {
+                    "email_subject": email.subject,
+                    "email_body": email.body,
+                    "sender_name": email.sender_name,
+                    "context_documents": docs,
+                    "intent": intent
+                }
+                for email, (docs, intent) in zip(emails, retrieved)
+            ])
+        except Exception as e:
+            logger.error("Batch response generation failed: %s", e)
+            responses = [None] * len(emails)
         
-        if processed_count < len(emails):
-            return "continue"
-        return "complete"
+        # Emails without a response are recorded as failed and released by _process_batch
+        outcomes = await asyncio.gather(
+            *(cls._send(email, response, log) for email, response, log in zip(emails, responses, logs)),
+            return_exceptions=True
+        )
+        return cls._collect_results(emails, outcomes)
     
-    def _finalize_processing(self, state: EmailProcessingState) -> EmailProcessingState:
+    @staticmethod
+    def _finalize_processing(state: EmailProcessingState) -> Dict[str, Any]:
         """Finalize the processing session."""
         
-        successful = state.get("successful_responses", 0)
-        failed = state.get("failed_responses", 0)
-        total_emails = len(state.get("emails", []))
+        successful = state.successful_responses
+        failed = state.failed_responses
+        skipped = state.skipped_emails
+        total_emails = state.total_emails
         
-        summary = f"Processing complete: {successful} successful, {failed} failed out of {total_emails} emails"
+        summary = (
+            f"Processing complete: {successful} successful, {failed} failed, "
+            f"{skipped} skipped out of {total_emails} emails"
+        )
         logger.info(summary)
         
-        processing_log = state.get("processing_log", [])
-        processing_log.append(summary)
-        state["processing_log"] = processing_log
-        
-        return state
+        return {"processing_log": [summary]}
     
     def process_emails(self, thread_id: str = "default") -> Dict[str, Any]:
         """Process emails using the workflow.
         
+        Synchronous entry point; runs ``aprocess_emails`` on a new event loop.
+        
         Args:
             thread_id: Unique thread ID for this processing session
             
         Returns:
             Dict containing processing results and statistics
         """
+        return asyncio.run(self.aprocess_emails(thread_id))
+    
+    async def aprocess_emails(self, thread_id: str = "default") -> Dict[str, Any]:
+        """Async version of ``process_emails``."""
         
         if not self.graph:
             logger.error("Workflow graph not initialized")
             return {"error": "Workflow not initialized"}
         
         try:
-            # Initialize state
-            initial_state: EmailProcessingState = {
-                "emails": [],
-                "current_email": None,
-                "processed_count": 0,
-                "successful_responses": 0,
-                "failed_responses": 0,
-                "intent": None,
-                "relevant_docs": [],
-                "generated_response": None,
-                "send_result": None,
-                "last_error": None,
-                "processing_log": []
-            }
+            # Initialize state from the dataclass defaults
+            initial_state = asdict(EmailProcessingState())
             
             # Run workflow
             config_dict = {"configurable": {"thread_id": thread_id}}
-            final_state = self.graph.invoke(initial_state, config=config_dict)
+            final_state = await self.graph.ainvoke(initial_state, config=config_dict)
             
             # Return results
             return {
                 "success": True,
-                "total_emails": len(final_state.get("emails", [])),
+                "total_emails": final_state["total_emails"],
+                "skipped_emails": final_state.get("skipped_emails", 0),
                 "successful_responses": final_state.get("successful_responses", 0),
                 "failed_responses": final_state.get("failed_responses", 0),
                 "processing_log": final_state.get("processing_log", []),
@@ -373,19 +466,52 @@ class EmailWorkflow:
                 "success": False,
                 "error": error_msg
             }
+        finally:
+            await email_sender.aclose()
+            # Persist replies cached during the run, off the event loop
+            await asyncio.to_thread(cache_manager.save_semantic_cache)
     
     def get_workflow_status(self) -> Dict[str, Any]:
         """Get the status of workflow components."""
+        return asyncio.run(self.aget_workflow_status())
+    
+    async def aget_workflow_status(self) -> Dict[str, Any]:
+        """Async version of ``get_workflow_status``.
+        
+        Components are probed concurrently, so the check takes as long as the
+        slowest probe rather than the sum of all of them. The result is
+        reused for ``STATUS_CACHE_SECONDS``.
+        """
+        if self._last_status is not None and time.monotonic() - self._last_status_at < STATUS_CACHE_SECONDS:
+            return dict(self._last_status)
+        
+        results = await asyncio.gather(
+            gmail_fetcher.atest_connection(),
+            asyncio.to_thread(policy_retriever.get_index_stats),
+            asyncio.to_thread(llm_response_chain.test_connection),
+            asyncio.to_thread(email_sender.test_connection),
+            asyncio.to_thread(cache_manager.test_connection),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error("Component status check failed: %s", result)
+        gmail_ok, index_stats, llm_ok, sender_ok, cache_ok = (
+            None if isinstance(result, Exception) else result for result in results
+        )
         
-        return {
+        status = {
             "workflow_ready": self.graph is not None,
-            "gmail_fetcher_ready": gmail_fetcher.test_connection(),
-            "policy_retriever_ready": policy_retriever.get_index_stats()["vectorstore_exists"],
-            "llm_response_ready": llm_response_chain.test_connection(),
-            "email_sender_ready": email_sender.test_connection(),
-            "cache_ready": cache_manager.test_connection()
+            "gmail_fetcher_ready": gmail_ok is True,
+            "policy_retriever_ready": bool(index_stats and index_stats["vectorstore_exists"]),
+            "llm_response_ready": llm_ok is True,
+            "email_sender_ready": sender_ok is True,
+            "cache_ready": cache_ok is True
         }
+        self._last_status = status
+        self._last_status_at = time.monotonic()
+        return dict(status)
 
 
 # Global workflow instance
-email_workflow = EmailWorkflow() 
\ No newline at end of file
+email_workflow = EmailWorkflow(enable_checkpointing=config.workflow_checkpointing) 
\ No newline at end of file